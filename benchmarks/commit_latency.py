@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""Time answer commits under different SQLite pragma profiles.
+
+Run from the repository root, e.g. `python benchmarks/commit_latency.py`.
+Every profile gets its own data directory; the answers are recorded and
+committed one at a time, the way `drill-srs review` does it without the
+answer journal.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List
+
+DECK_NAME = "bench"
+PROFILES = {
+    "default": "",
+    "wal-full": "synchronous=FULL",
+    "delete-full": "journal_mode=DELETE,synchronous=FULL",
+}
+
+
+def _measure(answer_count: int) -> List[float]:
+    from drillsrs import db, scheduler
+
+    latencies = []
+    with db.session_scope() as session:
+        deck = db.get_deck_by_name(session, DECK_NAME)
+        cards = (
+            session.query(db.Card)
+            .filter(db.Card.deck_id == deck.id)
+            .order_by(db.Card.rank)
+            .limit(answer_count)
+        )
+        for card in cards.all():
+            start = time.perf_counter()
+            user_answer = db.UserAnswer()
+            user_answer.date = datetime.now()
+            user_answer.is_correct = True
+            scheduler.answer_card(card, user_answer)
+            session.commit()
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def _run_profile(
+    tmp_dir: str, name: str, pragmas: str, args: argparse.Namespace
+) -> List[float]:
+    env = dict(
+        os.environ,
+        XDG_DATA_HOME=os.path.join(tmp_dir, name),
+        PYTHONPATH=os.getcwd(),
+        DRILLSRS_SQLITE_PRAGMAS=pragmas,
+    )
+
+    def drill(*drill_args: str, stdin: str = "") -> None:
+        subprocess.run(
+            [sys.executable, "-m", "drillsrs", *drill_args],
+            env=env,
+            input=stdin,
+            text=True,
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+
+    drill("create-deck", DECK_NAME)
+    drill(
+        "add-cards",
+        DECK_NAME,
+        stdin="".join(
+            "question %d\tanswer %d\n" % (num, num)
+            for num in range(args.cards)
+        ),
+    )
+    # a fresh process per profile, the engine and its pragmas are global
+    output = subprocess.run(
+        [sys.executable, __file__, "--measure", str(args.answers)],
+        env=env,
+        check=True,
+        stdout=subprocess.PIPE,
+    ).stdout
+    return json.loads(output)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--cards", type=int, default=10000)
+    parser.add_argument("-a", "--answers", type=int, default=200)
+    parser.add_argument(
+        "-p",
+        "--profile",
+        action="append",
+        metavar="NAME=PRAGMAS",
+        help="add a profile, e.g. 'off=synchronous=OFF'",
+    )
+    parser.add_argument(
+        "-d",
+        "--dir",
+        help="keep the decks in this directory instead of the temporary one",
+    )
+    parser.add_argument("--measure", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure is not None:
+        print(json.dumps(_measure(args.measure)))
+        return
+
+    profiles: Dict[str, str] = dict(PROFILES)
+    for item in args.profile or []:
+        name, _sep, pragmas = item.partition("=")
+        profiles[name] = pragmas
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp_dir:
+        for name, pragmas in profiles.items():
+            latencies = sorted(_run_profile(tmp_dir, name, pragmas, args))
+            print(
+                "%-12s %-40s median %6.2f ms, p95 %6.2f ms, max %6.2f ms"
+                % (
+                    name,
+                    pragmas or "(built-in profile)",
+                    statistics.median(latencies) * 1000,
+                    latencies[int(len(latencies) * 0.95)] * 1000,
+                    latencies[-1] * 1000,
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""Time `drill-srs import` of a generated deck with answer history.
+
+Run from the repository root, e.g. `python benchmarks/import_deck.py`.
+Every run imports into an empty data directory. Peak RSS is the largest
+resident set size of the import processes.
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import IO, Dict
+
+DECK_NAME = "bench"
+TAG_COUNT = 10
+
+
+def _write_deck(handle: IO[str], card_count: int, max_answers: int) -> int:
+    rng = random.Random(1)
+    start = datetime.now() - timedelta(days=365)
+    handle.write(
+        '{"name":%s,"description":"","tags":%s,"cards":['
+        % (
+            json.dumps(DECK_NAME),
+            json.dumps(
+                [
+                    {"name": "t%d" % i, "color": "grey"}
+                    for i in range(TAG_COUNT)
+                ]
+            ),
+        )
+    )
+    answer_count = 0
+    for num in range(1, card_count + 1):
+        date = start + timedelta(minutes=num)
+        user_answers = []
+        for _ in range(rng.randint(0, max_answers)):
+            date += timedelta(hours=rng.randint(1, 200))
+            user_answers.append(
+                {"date": date.isoformat(), "correct": rng.random() < 0.8}
+            )
+        answer_count += len(user_answers)
+        if num > 1:
+            handle.write(",")
+        json.dump(
+            {
+                "id": num,
+                "question": "question %d" % num,
+                "answers": ["answer %d" % num],
+                "active": bool(user_answers),
+                "activation_date": (
+                    user_answers[0]["date"] if user_answers else None
+                ),
+                "tags": ["t%d" % (num % TAG_COUNT)] if num % 3 else [],
+                "user_answers": user_answers,
+            },
+            handle,
+        )
+    handle.write("]}")
+    return answer_count
+
+
+def _import(env: Dict[str, str], deck_path: str) -> float:
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-m", "drillsrs", "import", deck_path],
+        env=env,
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    return time.perf_counter() - start
+
+
+def _get_peak_rss() -> int:
+    peak_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--cards", type=int, default=100000)
+    parser.add_argument("-a", "--max-answers", type=int, default=10)
+    parser.add_argument("-r", "--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        deck_path = os.path.join(tmp_dir, "deck.json")
+        with open(deck_path, "w") as handle:
+            answer_count = _write_deck(handle, args.cards, args.max_answers)
+
+        times = []
+        for run in range(args.runs):
+            env = dict(
+                os.environ,
+                XDG_DATA_HOME=os.path.join(tmp_dir, "data%d" % run),
+                PYTHONPATH=os.getcwd(),
+            )
+            times.append(_import(env, deck_path))
+        elapsed = statistics.median(times)
+        print(
+            "%d cards, %d answers, %.1f MiB file: median %.2f s "
+            "(%.0f cards/s, %.0f answers/s), peak RSS %.1f MiB"
+            % (
+                args.cards,
+                answer_count,
+                os.path.getsize(deck_path) / (1 << 20),
+                elapsed,
+                args.cards / elapsed,
+                answer_count / elapsed,
+                _get_peak_rss() / (1 << 20),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""Time `drill-srs stats` on a generated deck.
+
+Run from the repository root, e.g. `python benchmarks/stats_report.py`.
+The first run starts with an empty template cache, the rest reuse it.
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable
+
+DECK_NAME = "bench"
+TAGS = [
+    {"name": "t0", "color": "red"},
+    {"name": "t1", "color": "blue"},
+    {"name": "t2", "color": "grey"},
+]
+
+
+def _generate_cards(card_count: int) -> Iterable[Dict[str, Any]]:
+    rng = random.Random(1)
+    now = datetime.now()
+    for num in range(1, card_count + 1):
+        is_active = num <= card_count * 0.7
+        user_answers = []
+        date = now - timedelta(days=60)
+        if is_active:
+            for _ in range(rng.randint(0, 8)):
+                date += timedelta(hours=rng.randint(1, 100))
+                user_answers.append(
+                    {"date": date.isoformat(), "correct": rng.random() < 0.7}
+                )
+        yield {
+            "id": num,
+            "question": "q%d" % num,
+            "answers": ["a%d" % num],
+            "active": is_active,
+            "activation_date": (
+                (now - timedelta(days=61, hours=-num)).isoformat()
+                if is_active
+                else None
+            ),
+            "tags": ["t%d" % (num % 3)] if num % 2 else [],
+            "user_answers": user_answers,
+        }
+
+
+def _drill(env: Dict[str, str], *args: str) -> float:
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-m", "drillsrs", *args],
+        env=env,
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--cards", type=int, default=30000)
+    parser.add_argument("-r", "--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        env = dict(
+            os.environ,
+            XDG_DATA_HOME=os.path.join(tmp_dir, "data"),
+            XDG_CACHE_HOME=os.path.join(tmp_dir, "cache"),
+            PYTHONPATH=os.getcwd(),
+        )
+        deck_path = os.path.join(tmp_dir, "deck.json")
+        with open(deck_path, "w") as handle:
+            json.dump(
+                {
+                    "name": DECK_NAME,
+                    "description": "",
+                    "tags": TAGS,
+                    "cards": list(_generate_cards(args.cards)),
+                },
+                handle,
+            )
+        _drill(env, "import", deck_path)
+
+        report_path = os.path.join(tmp_dir, "report.html")
+        times = [
+            _drill(env, "stats", DECK_NAME, report_path)
+            for _ in range(args.runs)
+        ]
+        print(
+            "%d cards: first run %.3f s, median of the rest %.3f s"
+            % (args.cards, times[0], statistics.median(times[1:] or times))
+        )
+
+
+if __name__ == "__main__":
+    main()
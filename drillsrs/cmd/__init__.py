@@ -1,44 +1,178 @@
-from typing import List
+import argparse
+import importlib
+from typing import List, Optional
 
 from drillsrs.cmd.command_base import CommandBase
-from drillsrs.cmd.create_card import CreateCardCommand
-from drillsrs.cmd.create_deck import CreateDeckCommand
-from drillsrs.cmd.create_tag import CreateTagCommand
-from drillsrs.cmd.delete_card import DeleteCardCommand
-from drillsrs.cmd.delete_deck import DeleteDeckCommand
-from drillsrs.cmd.delete_tag import DeleteTagCommand
-from drillsrs.cmd.export import ExportCommand
-from drillsrs.cmd.howto import HowToCommand
-from drillsrs.cmd.import_ import ImportCommand
-from drillsrs.cmd.list_cards import ListCardsCommand
-from drillsrs.cmd.list_decks import ListDecksCommand
-from drillsrs.cmd.list_tags import ListTagsCommand
-from drillsrs.cmd.review import ReviewCommand
-from drillsrs.cmd.stats import StatsCommand
-from drillsrs.cmd.study import StudyCommand
-from drillsrs.cmd.update_card import UpdateCardCommand
-from drillsrs.cmd.update_deck import UpdateDeckCommand
-from drillsrs.cmd.update_tag import UpdateTagCommand
+
+
+class LazyCommand(CommandBase):
+    def __init__(
+        self,
+        module_name: str,
+        class_name: str,
+        names: List[str],
+        description: str,
+    ) -> None:
+        self.module_name = module_name
+        self.class_name = class_name
+        self.names = names
+        self.description = description
+        self._command: Optional[CommandBase] = None
+
+    @property
+    def command(self) -> CommandBase:
+        if self._command is None:
+            module = importlib.import_module(
+                "drillsrs.cmd." + self.module_name
+            )
+            self._command = getattr(module, self.class_name)()
+        return self._command
+
+    def decorate_arg_parser(self, parser: argparse.ArgumentParser) -> None:
+        self.command.decorate_arg_parser(parser)
+
+    def run(self, args: argparse.Namespace) -> None:
+        self.command.run(args)
 
 
 def get_all_commands() -> List[CommandBase]:
     return [
-        HowToCommand(),
-        ListDecksCommand(),
-        CreateDeckCommand(),
-        UpdateDeckCommand(),
-        DeleteDeckCommand(),
-        ListTagsCommand(),
-        CreateTagCommand(),
-        UpdateTagCommand(),
-        DeleteTagCommand(),
-        ListCardsCommand(),
-        CreateCardCommand(),
-        UpdateCardCommand(),
-        DeleteCardCommand(),
-        StudyCommand(),
-        ReviewCommand(),
-        StatsCommand(),
-        ExportCommand(),
-        ImportCommand(),
+        LazyCommand(
+            "howto",
+            "HowToCommand",
+            ["how-to"],
+            "show a mini-tutorial how to use",
+        ),
+        LazyCommand(
+            "list_decks", "ListDecksCommand", ["list-decks"], "print all decks"
+        ),
+        LazyCommand(
+            "due",
+            "DueCommand",
+            ["due"],
+            "print how many cards are due in each deck",
+        ),
+        LazyCommand(
+            "create_deck",
+            "CreateDeckCommand",
+            ["create-deck"],
+            "create a new deck",
+        ),
+        LazyCommand(
+            "update_deck",
+            "UpdateDeckCommand",
+            ["edit-deck", "update-deck"],
+            "edit a single deck",
+        ),
+        LazyCommand(
+            "delete_deck",
+            "DeleteDeckCommand",
+            ["delete-deck"],
+            "delete a whole deck",
+        ),
+        LazyCommand(
+            "list_tags",
+            "ListTagsCommand",
+            ["list-tags"],
+            "print all tags in a deck",
+        ),
+        LazyCommand(
+            "create_tag",
+            "CreateTagCommand",
+            ["add-tag", "create-tag"],
+            "add a new tag to a deck",
+        ),
+        LazyCommand(
+            "update_tag",
+            "UpdateTagCommand",
+            ["edit-tag", "update-tag"],
+            "edit a single tag",
+        ),
+        LazyCommand(
+            "delete_tag",
+            "DeleteTagCommand",
+            ["delete-tag"],
+            "delete a tag from the deck",
+        ),
+        LazyCommand(
+            "list_cards",
+            "ListCardsCommand",
+            ["list-cards"],
+            "print all flashcards in a deck",
+        ),
+        LazyCommand(
+            "search",
+            "SearchCommand",
+            ["search"],
+            "search flashcards by question and answer text",
+        ),
+        LazyCommand(
+            "create_card",
+            "CreateCardCommand",
+            ["add-card", "create-card"],
+            "add a new flashcard to a deck",
+        ),
+        LazyCommand(
+            "create_cards",
+            "CreateCardsCommand",
+            ["add-cards", "create-cards"],
+            "add many flashcards to a deck from a TSV file",
+        ),
+        LazyCommand(
+            "update_card",
+            "UpdateCardCommand",
+            ["edit-card", "update-card"],
+            "edit a single flashcard",
+        ),
+        LazyCommand(
+            "delete_card",
+            "DeleteCardCommand",
+            ["delete-card"],
+            "delete a single flashcard",
+        ),
+        LazyCommand(
+            "study",
+            "StudyCommand",
+            ["study", "learn"],
+            "begin a study session",
+        ),
+        LazyCommand(
+            "review", "ReviewCommand", ["review"], "begin a review session"
+        ),
+        LazyCommand(
+            "stats",
+            "StatsCommand",
+            ["stats"],
+            "produce an HTML report about the chosen deck",
+        ),
+        LazyCommand(
+            "rebuild_stats",
+            "RebuildStatsCommand",
+            ["rebuild-stats"],
+            "recompute the daily statistics of a deck from its history",
+        ),
+        LazyCommand(
+            "export",
+            "ExportCommand",
+            ["export"],
+            "export a deck to a JSON file",
+        ),
+        LazyCommand(
+            "import_",
+            "ImportCommand",
+            ["import"],
+            "import a deck from a JSON file",
+        ),
+        LazyCommand(
+            "daemon",
+            "DaemonCommand",
+            ["daemon"],
+            "serve read-only commands from a warm background process",
+        ),
+        LazyCommand(
+            "verify_deck",
+            "VerifyDeckCommand",
+            ["verify-deck"],
+            "check the cards' stored state against their answer history",
+        ),
     ]
@@ -1,8 +1,6 @@
 import argparse
 from typing import List
 
-import sqlalchemy as sa
-
 from drillsrs import db
 from drillsrs.cmd.command_base import CommandBase
 
@@ -54,6 +52,7 @@ class CreateCardCommand(CommandBase):
 
             max_card_num = db.get_max_card_num(session, deck)
             card = db.Card()
+            card.deck_id = deck.id
             card.num = max_card_num + 1
             card.question = question
             card.answers = answers
@@ -62,7 +61,9 @@ class CreateCardCommand(CommandBase):
             ]
             card.is_active = False
             card.due_date = None
-            deck.cards.append(card)
+            session.add(card)
             if prepend:
-                max_active_card_num = db.get_max_active_card_num(session, deck)
-                db.move_card(session, card, max_active_card_num + 1)
+                rank = db.get_max_active_card_rank(session, deck)
+            else:
+                rank = db.get_max_card_rank(session, deck)
+            db.place_card_after(session, deck, card, rank)
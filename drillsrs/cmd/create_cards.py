@@ -0,0 +1,165 @@
+import argparse
+import csv
+import itertools
+import sys
+import time
+from typing import IO, Any, Dict, Iterable, List, Optional, Tuple
+
+from drillsrs import db, error
+from drillsrs.cmd.command_base import CommandBase
+from drillsrs.cmd.create_card import APPEND, PREPEND
+
+BATCH_SIZE = 1000
+
+Record = Tuple[str, List[str], List[str]]
+
+
+def _read_records(handle: IO[Any], separator: str) -> Iterable[Record]:
+    for line_num, row in enumerate(
+        csv.reader(handle, delimiter="\t", quoting=csv.QUOTE_NONE), 1
+    ):
+        if not row or not any(row):
+            continue
+        if len(row) < 2 or len(row) > 3:
+            raise error.DrillError(
+                "Line %d: expected 2 or 3 tab separated columns, got %d"
+                % (line_num, len(row))
+            )
+        question = row[0].strip()
+        answers = [a.strip() for a in row[1].split(separator) if a.strip()]
+        tags = list(
+            dict.fromkeys(
+                t.strip()
+                for t in (row[2] if len(row) > 2 else "").split(separator)
+                if t.strip()
+            )
+        )
+        if not question or not answers:
+            raise error.DrillError(
+                "Line %d: the question and answers can't be empty" % line_num
+            )
+        yield question, answers, tags
+
+
+def _create_cards(
+    session: Any,
+    deck: db.Deck,
+    records: Iterable[Record],
+    prepend: bool,
+) -> int:
+    card_table = db.Card.__table__
+    card_tag_table = db.CardTag.__table__
+    tag_ids: Dict[str, int] = {
+        tag.name: tag.id
+        for tag in session.query(db.Tag).filter(db.Tag.deck_id == deck.id)
+    }
+    num = db.get_max_card_num(session, deck)
+    if prepend:
+        rank = db.get_max_active_card_rank(session, deck)
+    else:
+        rank = db.get_max_card_rank(session, deck)
+
+    card_count = 0
+    records = iter(records)
+    while True:
+        batch = list(itertools.islice(records, BATCH_SIZE))
+        if not batch:
+            break
+
+        first_num = num + 1
+        ranks = db.allocate_card_ranks(session, deck, rank, len(batch))
+        card_rows = []
+        card_tag_names = {}
+        for (question, answers, tags), card_rank in zip(batch, ranks):
+            for tag in tags:
+                if tag not in tag_ids:
+                    raise error.TagNotFoundError(
+                        "A tag with name %r doesn't exist" % tag
+                    )
+            num += 1
+            card_rows.append(
+                {
+                    "deck_id": deck.id,
+                    "num": num,
+                    "rank": card_rank,
+                    "question": question,
+                    "answers": answers,
+                    "active": False,
+                    "due_date": None,
+                }
+            )
+            card_tag_names[num] = tags
+        session.execute(card_table.insert(), card_rows)
+
+        card_tag_rows = [
+            {"card_id": card_id, "tag_id": tag_ids[tag]}
+            for card_id, card_num in session.query(db.Card.id, db.Card.num)
+            .filter(db.Card.deck_id == deck.id)
+            .filter(db.Card.num >= first_num)
+            for tag in card_tag_names[card_num]
+        ]
+        if card_tag_rows:
+            session.execute(card_tag_table.insert(), card_tag_rows)
+
+        rank = ranks[-1]
+        card_count += len(batch)
+    return card_count
+
+
+class CreateCardsCommand(CommandBase):
+    names = ["add-cards", "create-cards"]
+    description = "add many flashcards to a deck from a TSV file"
+
+    def decorate_arg_parser(self, parser: argparse.ArgumentParser) -> None:
+        parser.add_argument(
+            "deck", nargs="?", help="choose the deck to add the cards to"
+        )
+        parser.add_argument(
+            "-i",
+            "--input",
+            help=(
+                "path to a file with one card per line: question, answers "
+                "and optional tags separated by tabs; "
+                "if omitted, standard input is used"
+            ),
+        )
+        parser.add_argument(
+            "-s",
+            "--separator",
+            default=";",
+            help="set the separator of multiple answers and tags",
+        )
+        parser.add_argument(
+            "-p",
+            "--place",
+            choices=(PREPEND, APPEND),
+            default=PREPEND,
+            help="choose where to put the cards in the deck",
+        )
+
+    def run(self, args: argparse.Namespace) -> None:
+        deck_name: str = args.deck
+        path: Optional[str] = args.input
+        separator: str = args.separator
+        prepend: bool = args.place == PREPEND
+
+        start = time.perf_counter()
+        with db.session_scope() as session:
+            deck = db.get_deck_by_name(session, deck_name)
+            if path:
+                with open(path, "r", newline="") as handle:
+                    card_count = _create_cards(
+                        session,
+                        deck,
+                        _read_records(handle, separator),
+                        prepend,
+                    )
+            else:
+                card_count = _create_cards(
+                    session, deck, _read_records(sys.stdin, separator), prepend
+                )
+        elapsed = time.perf_counter() - start
+        print(
+            "Added %d cards in %.02f s (%.0f cards/s)."
+            % (card_count, elapsed, card_count / max(elapsed, 1e-9))
+        )
@@ -0,0 +1,27 @@
+import argparse
+import importlib
+
+import sqlalchemy as sa
+
+from drillsrs import cli, cmd, daemon, db
+from drillsrs.cmd.command_base import CommandBase
+
+
+class DaemonCommand(CommandBase):
+    names = ["daemon"]
+    description = "serve read-only commands from a warm background process"
+
+    def run(self, _args: argparse.Namespace) -> None:
+        commands = cmd.get_all_commands()
+        for command in commands:
+            if (
+                isinstance(command, cmd.LazyCommand)
+                and command.names[0] in daemon.SERVED_COMMANDS
+            ):
+                importlib.import_module("drillsrs.cmd." + command.module_name)
+        db.get_engine()
+        sa.orm.configure_mappers()
+        daemon.serve(
+            cli.create_arg_parser(commands, cli.DESCRIPTION),
+            cli.execute_command_with_args,
+        )
@@ -25,6 +25,4 @@ class DeleteCardCommand(CommandBase):
                 % (card.num, card.question)
             ):
                 return
-            for user_answer in card.user_answers:
-                session.delete(user_answer)
-            session.delete(card)
+            db.delete_card(session, card)
@@ -19,4 +19,4 @@ class DeleteDeckCommand(CommandBase):
                 "Are you sure you want to delete deck %r?" % deck_name
             ):
                 return
-            session.delete(deck)
+            db.delete_deck(session, deck)
@@ -24,4 +24,4 @@ class DeleteTagCommand(CommandBase):
                 "Are you sure you want to delete tag %r?" % tag.name
             ):
                 return
-            session.delete(tag)
+            db.delete_tag(session, tag)
@@ -0,0 +1,89 @@
+import argparse
+import contextlib
+import os
+import sqlite3
+from datetime import datetime, timedelta
+from typing import List
+
+from drillsrs import error, paths
+from drillsrs.cmd.command_base import CommandBase
+
+# the same text format SQLAlchemy uses for DateTime columns in SQLite
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+SOON = timedelta(hours=1)
+
+DUE_QUERY = """
+    SELECT
+        deck.name,
+        (
+            SELECT COUNT(*) FROM card
+            WHERE card.deck_id = deck.id AND card.active = 1
+            AND card.due_date <= :now
+        ),
+        (
+            SELECT COUNT(*) FROM card
+            WHERE card.deck_id = deck.id AND card.active = 1
+            AND card.due_date <= :soon
+        ),
+        (
+            SELECT MIN(card.due_date) FROM card
+            WHERE card.deck_id = deck.id AND card.active = 1
+            AND card.due_date > :now
+        )
+    FROM deck
+    ORDER BY deck.id
+"""
+
+
+def _format_date(text: str) -> str:
+    return datetime.strptime(text, DATE_FORMAT).isoformat(timespec="seconds")
+
+
+class DueCommand(CommandBase):
+    names = ["due"]
+    description = "print how many cards are due in each deck"
+
+    def decorate_arg_parser(self, parser: argparse.ArgumentParser) -> None:
+        parser.add_argument(
+            "deck", nargs="*", help="choose the deck names; all by default"
+        )
+
+    def run(self, args: argparse.Namespace) -> None:
+        deck_names: List[str] = args.deck
+
+        path = paths.get_db_path()
+        if not os.path.exists(path):
+            raise error.DeckNotFoundError(
+                "No deck available. Create one first."
+            )
+        now = datetime.now()
+        with contextlib.closing(
+            sqlite3.connect(path, timeout=5)
+        ) as connection:
+            rows = connection.execute(
+                DUE_QUERY,
+                {
+                    "now": now.strftime(DATE_FORMAT),
+                    "soon": (now + SOON).strftime(DATE_FORMAT),
+                },
+            ).fetchall()
+
+        known_names = {row[0] for row in rows}
+        for name in deck_names:
+            if name not in known_names:
+                raise error.DeckNotFoundError(
+                    "A deck with name %r doesn't exist" % name
+                )
+        for name, due_count, soon_count, next_due_date in rows:
+            if deck_names and name not in deck_names:
+                continue
+            print(
+                "\t".join(
+                    [
+                        name,
+                        str(due_count),
+                        str(soon_count),
+                        _format_date(next_due_date) if next_due_date else "-",
+                    ]
+                )
+            )
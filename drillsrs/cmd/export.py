@@ -1,14 +1,16 @@
 import argparse
+import itertools
 import json
 import sys
+from collections import defaultdict
 from datetime import datetime
-from typing import IO, Any, Optional
-
-import sqlalchemy as sa
+from typing import IO, Any, Dict, Iterator, List, Optional
 
 from drillsrs import db
 from drillsrs.cmd.command_base import CommandBase
 
+BATCH_SIZE = 500
+
 
 def _json_serializer(obj: object) -> object:
     if isinstance(obj, datetime):
@@ -17,37 +19,87 @@ def _json_serializer(obj: object) -> object:
     raise TypeError("Type not serializable")
 
 
-def _export(deck: db.Deck, handle: IO[Any]) -> None:
-    json.dump(
-        {
-            "name": deck.name,
-            "description": deck.description,
-            "tags": [
-                {"name": tag.name, "color": tag.color,} for tag in deck.tags
-            ],
-            "cards": [
-                {
-                    "id": card.num,
-                    "question": card.question,
-                    "answers": card.answers,
-                    "active": card.is_active,
-                    "activation_date": card.activation_date,
-                    "tags": [tag.name for tag in card.tags],
-                    "user_answers": [
-                        {"date": answer.date, "correct": answer.is_correct,}
-                        for answer in card.user_answers
-                    ],
-                }
-                for card in deck.cards
-            ],
-        },
-        handle,
+def _dumps(obj: object) -> str:
+    return json.dumps(
+        obj,
         default=_json_serializer,
         separators=(",", ":"),
         check_circular=False,
     )
 
 
+def _export_cards(session: Any, card_rows: List[Any]) -> Iterator[str]:
+    card_ids = [row.id for row in card_rows]
+    tag_names: Dict[int, List[str]] = defaultdict(list)
+    for card_id, name in (
+        session.query(db.CardTag.card_id, db.Tag.name)
+        .join(db.Tag, db.Tag.id == db.CardTag.tag_id)
+        .filter(db.CardTag.card_id.in_(card_ids))
+    ):
+        tag_names[card_id].append(name)
+    user_answers: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+    for card_id, date, is_correct in (
+        session.query(
+            db.UserAnswer.card_id, db.UserAnswer.date, db.UserAnswer.is_correct
+        )
+        .filter(db.UserAnswer.card_id.in_(card_ids))
+        .order_by(db.UserAnswer.card_id, db.UserAnswer.id)
+    ):
+        user_answers[card_id].append({"date": date, "correct": is_correct})
+
+    for row in card_rows:
+        yield _dumps(
+            {
+                "id": row.num,
+                "rank": row.rank,
+                "question": row.question,
+                "answers": row.answers,
+                "active": row.is_active,
+                "activation_date": row.activation_date,
+                "tags": tag_names[row.id],
+                "user_answers": user_answers[row.id],
+            }
+        )
+
+
+def _export(session: Any, deck: db.Deck, handle: IO[Any]) -> None:
+    handle.write(
+        '{"name":%s,"description":%s,"tags":%s,"cards":['
+        % (
+            _dumps(deck.name),
+            _dumps(deck.description),
+            _dumps(
+                [{"name": tag.name, "color": tag.color} for tag in deck.tags]
+            ),
+        )
+    )
+    card_rows = iter(
+        session.query(
+            db.Card.id,
+            db.Card.num,
+            db.Card.rank,
+            db.Card.question,
+            db.Card.answers,
+            db.Card.is_active,
+            db.Card.activation_date,
+        )
+        .filter(db.Card.deck_id == deck.id)
+        .order_by(db.Card.rank.asc())
+        .yield_per(BATCH_SIZE)
+    )
+    first = True
+    while True:
+        batch = list(itertools.islice(card_rows, BATCH_SIZE))
+        if not batch:
+            break
+        for card_json in _export_cards(session, batch):
+            if not first:
+                handle.write(",")
+            handle.write(card_json)
+            first = False
+    handle.write("]}")
+
+
 class ExportCommand(CommandBase):
     names = ["export"]
     description = "export a deck to a JSON file"
@@ -66,22 +118,8 @@ class ExportCommand(CommandBase):
 
         with db.session_scope() as session:
             deck = db.get_deck_by_name(session, deck_name)
-            deck = (
-                session.query(db.Deck)
-                .filter(db.Deck.id == deck.id)
-                .options(
-                    sa.orm.subqueryload(db.Deck.cards).subqueryload(
-                        db.Card.tags
-                    ),
-                    sa.orm.subqueryload(db.Deck.cards).subqueryload(
-                        db.Card.user_answers
-                    ),
-                )
-                .one()
-            )
-
             if path:
                 with open(path, "w") as handle:
-                    _export(deck, handle)
+                    _export(session, deck, handle)
             else:
-                _export(deck, sys.stdout)
+                _export(session, deck, sys.stdout)
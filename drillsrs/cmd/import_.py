@@ -1,63 +1,425 @@
 import argparse
+import itertools
 import json
 import sys
-from typing import IO, Any, Optional
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import IO, Any, Dict, Iterator, List, NamedTuple, Optional, Set
 
-from dateutil.parser import parse as parse_date
+import sqlalchemy as sa
 
-from drillsrs import db, scheduler, util
+from drillsrs import db, error, scheduler, util
 from drillsrs.cmd.command_base import CommandBase
 
+BATCH_SIZE = 1000
+CHUNK_SIZE = 1 << 16
 
-def _import(handle: IO[Any]) -> None:
+MATCH_NUM = "num"
+MATCH_QUESTION = "question"
+
+
+class _UserAnswerRow(NamedTuple):
+    date: datetime
+    is_correct: bool
+
+
+class _DeckReader:
+    def __init__(self, handle: IO[Any]) -> None:
+        self._handle = handle
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        chunk = self._handle.read(CHUNK_SIZE)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos :] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        while True:
+            while (
+                self._pos < len(self._buffer)
+                and self._buffer[self._pos].isspace()
+            ):
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise error.DrillError("Unexpected end of the deck file")
+
+    def _expect(self, char: str) -> None:
+        if self._peek() != char:
+            raise error.DrillError(
+                "Malformed deck file: expected %r, got %r"
+                % (char, self._peek())
+            )
+        self._pos += 1
+
+    def _read_value(self) -> Any:
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # a number cut in half by the chunk boundary still decodes
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def read_header(self) -> Dict[str, Any]:
+        header: Dict[str, Any] = {}
+        self._expect("{")
+        if self._peek() == "}":
+            return header
+        while True:
+            key = self._read_value()
+            self._expect(":")
+            if key == "cards":
+                return header
+            header[key] = self._read_value()
+            if self._peek() == "}":
+                raise error.DrillError("The deck file contains no cards")
+            self._expect(",")
+
+    def read_cards(self) -> Iterator[Dict[str, Any]]:
+        self._expect("[")
+        if self._peek() == "]":
+            return
+        while True:
+            yield self._read_value()
+            if self._peek() == "]":
+                return
+            self._expect(",")
+
+
+def _parse_date(text: str) -> datetime:
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        from dateutil.parser import parse as parse_date
+
+        return parse_date(text)
+
+
+def _get_rank(card_obj: Dict[str, Any]) -> int:
+    # older exports carry no rank and list the cards in row order, their num
+    # was the position in the deck
+    return card_obj.get("rank", card_obj["id"] * db.RANK_GAP)
+
+
+def _get_user_answers(card_obj: Dict[str, Any]) -> List[_UserAnswerRow]:
+    return [
+        _UserAnswerRow(
+            _parse_date(user_answer_obj["date"]), user_answer_obj["correct"]
+        )
+        for user_answer_obj in card_obj["user_answers"]
+    ]
+
+
+def _get_card_state(
+    card_obj: Dict[str, Any], user_answers: List[_UserAnswerRow]
+) -> Dict[str, Any]:
+    activation_date = None
+    if "activation_date" in card_obj:
+        if card_obj["activation_date"]:
+            activation_date = _parse_date(card_obj["activation_date"])
+    elif user_answers:
+        activation_date = min(ua.date for ua in user_answers)
+
+    correct_answer_count = sum(1 for ua in user_answers if ua.is_correct)
+    last_answer_date = user_answers[-1].date if user_answers else None
+    score, streak = scheduler.replay_answers(user_answers)
+    return {
+        "question": card_obj["question"],
+        "answers": card_obj["answers"],
+        "active": card_obj["active"],
+        "activation_date": activation_date,
+        "due_date": scheduler.get_due_date(
+            card_obj["active"], last_answer_date, score
+        ),
+        "first_answer_date": min(
+            (ua.date for ua in user_answers), default=None
+        ),
+        "last_answer_date": last_answer_date,
+        "total_answer_count": len(user_answers),
+        "correct_answer_count": correct_answer_count,
+        "incorrect_answer_count": len(user_answers) - correct_answer_count,
+        "score": score,
+        "streak": streak,
+    }
+
+
+def _insert_cards(
+    session: Any,
+    deck: db.Deck,
+    tag_ids: Dict[str, int],
+    card_objs: List[Dict[str, Any]],
+    ranks: List[int],
+) -> None:
+    card_rows = []
+    user_answer_rows = {}
+    for card_obj, rank in zip(card_objs, ranks):
+        user_answers = _get_user_answers(card_obj)
+        user_answer_rows[rank] = user_answers
+        card_rows.append(
+            {
+                "deck_id": deck.id,
+                "num": card_obj["id"],
+                "rank": rank,
+                **_get_card_state(card_obj, user_answers),
+            }
+        )
+    session.execute(db.Card.__table__.insert(), card_rows)
+
+    card_ids = {
+        rank: card_id
+        for card_id, rank in session.query(db.Card.id, db.Card.rank)
+        .filter(db.Card.deck_id == deck.id)
+        .filter(db.Card.rank >= min(ranks))
+        .filter(db.Card.rank <= max(ranks))
+    }
+    user_answer_values = [
+        {
+            "card_id": card_ids[rank],
+            "date": user_answer.date,
+            "is_correct": user_answer.is_correct,
+        }
+        for rank, user_answers in user_answer_rows.items()
+        for user_answer in user_answers
+    ]
+    if user_answer_values:
+        session.execute(db.UserAnswer.__table__.insert(), user_answer_values)
+    card_tag_values = [
+        {"card_id": card_ids[card_row["rank"]], "tag_id": tag_ids[name]}
+        for card_row, card_obj in zip(card_rows, card_objs)
+        for name in card_obj["tags"]
+    ]
+    if card_tag_values:
+        session.execute(db.CardTag.__table__.insert(), card_tag_values)
+
+
+def _merge_cards(
+    session: Any,
+    deck: db.Deck,
+    tag_ids: Dict[str, int],
+    card_objs: List[Dict[str, Any]],
+    match: str,
+    counts: Counter,
+) -> None:
+    card_table = db.Card.__table__
+    card_tag_table = db.CardTag.__table__
+    if match == MATCH_NUM:
+        keys = [card_obj["id"] for card_obj in card_objs]
+        key_column = db.Card.num
+    else:
+        keys = [card_obj["question"] for card_obj in card_objs]
+        key_column = db.Card.question
+
+    existing_cards = {}
+    for row in (
+        session.query(
+            db.Card.id,
+            db.Card.num,
+            db.Card.question,
+            db.Card.answers,
+            db.Card.is_active,
+            db.Card.activation_date,
+        )
+        .filter(db.Card.deck_id == deck.id)
+        .filter(key_column.in_(keys))
+        .order_by(db.Card.rank.asc())
+    ):
+        existing_cards.setdefault(getattr(row, match), row)
+    card_ids = [row.id for row in existing_cards.values()]
+
+    existing_tag_ids: Dict[int, Set[int]] = defaultdict(set)
+    for card_id, tag_id in session.query(
+        db.CardTag.card_id, db.CardTag.tag_id
+    ).filter(db.CardTag.card_id.in_(card_ids)):
+        existing_tag_ids[card_id].add(tag_id)
+    existing_answers: Dict[int, List[_UserAnswerRow]] = defaultdict(list)
+    for card_id, date, is_correct in (
+        session.query(
+            db.UserAnswer.card_id, db.UserAnswer.date, db.UserAnswer.is_correct
+        )
+        .filter(db.UserAnswer.card_id.in_(card_ids))
+        .order_by(db.UserAnswer.card_id, db.UserAnswer.id)
+    ):
+        existing_answers[card_id].append(_UserAnswerRow(date, is_correct))
+
+    new_card_objs = []
+    card_values = []
+    user_answer_values = []
+    retagged_card_ids = []
+    card_tag_values = []
+    for card_obj in card_objs:
+        key = card_obj["id"] if match == MATCH_NUM else card_obj["question"]
+        row = existing_cards.get(key)
+        if row is None:
+            new_card_objs.append(card_obj)
+            continue
+
+        user_answers = existing_answers[row.id]
+        known_answers = set(user_answers)
+        new_answers = [
+            user_answer
+            for user_answer in _get_user_answers(card_obj)
+            if user_answer not in known_answers
+        ]
+        state = _get_card_state(card_obj, user_answers + new_answers)
+        card_tag_ids = {tag_ids[name] for name in card_obj["tags"]}
+
+        fields_changed = bool(new_answers) or (
+            row.question,
+            row.answers,
+            row.is_active,
+            row.activation_date,
+        ) != (
+            state["question"],
+            state["answers"],
+            state["active"],
+            state["activation_date"],
+        )
+        tags_changed = card_tag_ids != existing_tag_ids[row.id]
+        if not fields_changed and not tags_changed:
+            counts["unchanged"] += 1
+            continue
+
+        counts["updated"] += 1
+        if fields_changed:
+            card_values.append({"card_id": row.id, **state})
+        user_answer_values.extend(
+            {
+                "card_id": row.id,
+                "date": user_answer.date,
+                "is_correct": user_answer.is_correct,
+            }
+            for user_answer in new_answers
+        )
+        if tags_changed:
+            retagged_card_ids.append(row.id)
+            card_tag_values.extend(
+                {"card_id": row.id, "tag_id": tag_id}
+                for tag_id in card_tag_ids
+            )
+
+    if card_values:
+        session.execute(
+            card_table.update().where(
+                card_table.c.id == sa.bindparam("card_id")
+            ),
+            card_values,
+        )
+    if user_answer_values:
+        session.execute(db.UserAnswer.__table__.insert(), user_answer_values)
+    if retagged_card_ids:
+        session.execute(
+            card_tag_table.delete().where(
+                card_tag_table.c.card_id.in_(retagged_card_ids)
+            )
+        )
+    if card_tag_values:
+        session.execute(card_tag_table.insert(), card_tag_values)
+
+    if new_card_objs:
+        new_card_objs.sort(key=_get_rank)
+        if match == MATCH_QUESTION:
+            num = db.get_max_card_num(session, deck)
+            for card_obj in new_card_objs:
+                num += 1
+                card_obj["id"] = num
+        rank = db.get_max_card_rank(session, deck)
+        ranks = [
+            rank + i * db.RANK_GAP for i in range(1, len(new_card_objs) + 1)
+        ]
+        _insert_cards(session, deck, tag_ids, new_card_objs, ranks)
+        counts["inserted"] += len(new_card_objs)
+
+
+def _merge_tags(
+    session: Any, deck: db.Deck, tag_objs: List[Dict[str, Any]]
+) -> Dict[str, int]:
+    tags = {tag.name: tag for tag in deck.tags}
+    for tag_obj in tag_objs:
+        tag = tags.get(tag_obj["name"])
+        if tag is None:
+            tag = db.Tag()
+            tag.name = tag_obj["name"]
+            deck.tags.append(tag)
+            tags[tag.name] = tag
+        if tag.color != tag_obj["color"]:
+            tag.color = tag_obj["color"]
+    session.flush()
+    return {tag.name: tag.id for tag in deck.tags}
+
+
+def _import(handle: IO[Any], merge: bool, match: str) -> None:
     with db.session_scope() as session:
-        deck_obj = json.load(handle)
+        reader = _DeckReader(handle)
+        deck_obj = reader.read_header()
+        if "name" not in deck_obj:
+            raise error.DrillError(
+                "The deck name must precede the cards in the deck file"
+            )
+
+        existing_deck = db.try_get_deck_by_name(session, deck_obj["name"])
+        if existing_deck and merge:
+            deck = existing_deck
+            if "description" in deck_obj:
+                deck.description = deck_obj["description"]
+            tag_ids = _merge_tags(session, deck, deck_obj.get("tags", []))
+
+            counts: Counter = Counter()
+            card_objs = reader.read_cards()
+            while True:
+                batch = list(itertools.islice(card_objs, BATCH_SIZE))
+                if not batch:
+                    break
+                _merge_cards(session, deck, tag_ids, batch, match, counts)
+            print(
+                "Inserted %d, updated %d, unchanged %d cards."
+                % (counts["inserted"], counts["updated"], counts["unchanged"])
+            )
+            return
 
         deck = db.Deck()
         deck.name = deck_obj["name"]
-        deck.description = deck_obj["description"]
+        deck.description = deck_obj.get("description")
 
-        existing_deck = db.try_get_deck_by_name(session, deck.name)
         if existing_deck:
             if not util.confirm(
                 "Are you sure you want to overwrite deck %r?" % deck.name
             ):
                 return
-            session.delete(existing_deck)
-            session.commit()
+            db.delete_deck(session, existing_deck)
 
-        tag_dict = {}
-        for tag_obj in deck_obj["tags"]:
+        for tag_obj in deck_obj.get("tags", []):
             tag = db.Tag()
             tag.name = tag_obj["name"]
             tag.color = tag_obj["color"]
             deck.tags.append(tag)
-            tag_dict[tag.name] = tag
-
-        for card_obj in deck_obj["cards"]:
-            card = db.Card()
-            card.num = card_obj["id"]
-            card.question = card_obj["question"]
-            card.answers = card_obj["answers"]
-            card.is_active = card_obj["active"]
-            card.tags = [tag_dict[name] for name in card_obj["tags"]]
-            for user_answer_obj in card_obj["user_answers"]:
-                user_answer = db.UserAnswer()
-                user_answer.date = parse_date(user_answer_obj["date"])
-                user_answer.is_correct = user_answer_obj["correct"]
-                card.user_answers.append(user_answer)
-            if "activation_date" in card_obj:
-                if card_obj["activation_date"]:
-                    card.activation_date = parse_date(
-                        card_obj["activation_date"]
-                    )
-            elif card.user_answers:
-                card.activation_date = sorted(
-                    card.user_answers, key=lambda ua: ua.date
-                )[0].date
-            card.due_date = scheduler.next_due_date(card)
-            deck.cards.append(card)
         session.add(deck)
+        session.flush()
+        tag_ids = {tag.name: tag.id for tag in deck.tags}
+
+        card_objs = reader.read_cards()
+        while True:
+            batch = list(itertools.islice(card_objs, BATCH_SIZE))
+            if not batch:
+                break
+            ranks = [_get_rank(card_obj) for card_obj in batch]
+            _insert_cards(session, deck, tag_ids, batch, ranks)
 
 
 class ImportCommand(CommandBase):
@@ -70,11 +432,28 @@ class ImportCommand(CommandBase):
             nargs="?",
             help="path to import from; if omitted, standard input is used",
         )
+        parser.add_argument(
+            "-m",
+            "--merge",
+            action="store_true",
+            help=(
+                "merge the cards into an existing deck with the same name "
+                "instead of overwriting it"
+            ),
+        )
+        parser.add_argument(
+            "--match",
+            choices=(MATCH_NUM, MATCH_QUESTION),
+            default=MATCH_NUM,
+            help="choose how to match merged cards with the existing ones",
+        )
 
     def run(self, args: argparse.Namespace) -> None:
         path: Optional[str] = args.path
+        merge: bool = args.merge
+        match: str = args.match
         if path:
             with open(path, "r") as handle:
-                _import(handle)
+                _import(handle, merge, match)
         else:
-            _import(sys.stdin)
+            _import(sys.stdin, merge, match)
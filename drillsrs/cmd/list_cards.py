@@ -1,46 +1,16 @@
 import argparse
-from datetime import datetime
 from math import ceil, log10
 from typing import Optional
 
 import sqlalchemy as sa
 
-from drillsrs import db, util
+from drillsrs import db, tag_expr, util
 from drillsrs.cmd.command_base import CommandBase
 
 SORT_NONE = "none"
 SORT_DUE_DATE = "due-date"
 
-
-def _print_single_card(
-    index_length: int, card: db.Card, show_answers: bool
-) -> None:
-    print("Card %*s: " % (index_length, "#%s" % card.num), end="")
-    if card.is_active:
-        correct_user_answers = [
-            ua for ua in card.user_answers if ua.is_correct
-        ]
-
-        due_date = card.due_date
-        assert due_date
-
-        print(
-            "(answered %d time(s), %6.02f%% correct, due %s)"
-            % (
-                len(card.user_answers),
-                len(correct_user_answers) * 100.0 / len(card.user_answers)
-                if card.user_answers
-                else 100,
-                util.format_timedelta(due_date - datetime.now()),
-            ),
-            end=" ",
-        )
-    print(card.question, end="")
-    if show_answers:
-        print(": %s" % ", ".join(card.answers), end="")
-    if card.tags:
-        print(" [%s]" % util.format_card_tags(card.tags), end="")
-    print()
+BATCH_SIZE = 500
 
 
 class ListCardsCommand(CommandBase):
@@ -50,7 +20,14 @@ class ListCardsCommand(CommandBase):
     def decorate_arg_parser(self, parser: argparse.ArgumentParser) -> None:
         parser.add_argument("deck", nargs="?", help="choose the deck name")
         parser.add_argument("-q", "--question", help="filter by question text")
-        parser.add_argument("-t", "--tag", help="filter by tag")
+        parser.add_argument(
+            "-t",
+            "--tag",
+            help=(
+                "filter by a tag expression, "
+                "e.g. 'verb and (n5 or n4) and not rare'"
+            ),
+        )
         parser.add_argument(
             "--sort",
             default=SORT_NONE,
@@ -60,6 +37,18 @@ class ListCardsCommand(CommandBase):
         parser.add_argument(
             "--show-answers", action="store_true", help="show answers text"
         )
+        parser.add_argument(
+            "--limit", type=int, help="set max number of cards to show"
+        )
+        parser.add_argument(
+            "--offset", type=int, help="skip this many cards before showing"
+        )
+        parser.add_argument(
+            "--after",
+            type=int,
+            metavar="ID",
+            help="show only the cards that come after the given card",
+        )
 
     def run(self, args: argparse.Namespace) -> None:
         deck_name: str = args.deck
@@ -67,14 +56,21 @@ class ListCardsCommand(CommandBase):
         tag: Optional[str] = args.tag
         sort_style: str = args.sort
         show_answers: bool = args.show_answers
+        limit: Optional[int] = args.limit
+        offset: Optional[int] = args.offset
+        after: Optional[int] = args.after
 
         with db.session_scope() as session:
             deck = db.get_deck_by_name(session, deck_name)
             cards = (
                 session.query(db.Card)
                 .filter(db.Card.deck_id == deck.id)
-                .options(sa.orm.subqueryload("user_answers"))
+                .options(sa.orm.selectinload(db.Card.tags))
             )
+            if tag is not None:
+                cards = cards.filter(
+                    tag_expr.get_tag_filter(session, [deck], tag)
+                )
 
             if question is not None:
                 cards = cards.filter(
@@ -83,27 +79,44 @@ class ListCardsCommand(CommandBase):
                     )
                 )
 
+            if after is not None:
+                anchor = db.get_card_by_num(session, deck, after)
+                if sort_style == SORT_DUE_DATE and anchor.is_active:
+                    cards = cards.filter(
+                        sa.or_(
+                            db.Card.is_active == 0,
+                            db.Card.due_date > anchor.due_date,
+                            sa.and_(
+                                db.Card.due_date == anchor.due_date,
+                                db.Card.rank > anchor.rank,
+                            ),
+                        )
+                    )
+                elif sort_style == SORT_DUE_DATE:
+                    cards = cards.filter(db.Card.is_active == 0)
+                    cards = cards.filter(db.Card.rank > anchor.rank)
+                else:
+                    cards = cards.filter(db.Card.rank > anchor.rank)
+
             if sort_style == SORT_NONE:
-                cards = cards.order_by(db.Card.num.asc())
+                cards = cards.order_by(db.Card.rank.asc())
             elif sort_style == SORT_DUE_DATE:
                 cards = cards.order_by(db.Card.is_active.desc())
                 cards = cards.order_by(db.Card.due_date.asc())
-                cards = cards.order_by(db.Card.num.asc())
+                cards = cards.order_by(db.Card.rank.asc())
             else:
                 assert False
 
-            cards = cards.all()
-            if tag is not None:
-                cards = [
-                    card
-                    for card in cards
-                    if tag.lower() in [t.name.lower() for t in card.tags]
-                ]
+            if offset is not None:
+                cards = cards.offset(offset)
+            if limit is not None:
+                cards = cards.limit(limit)
 
-            if not cards:
-                print("No cards to show.")
-                return
+            index_length = ceil(log10(db.get_max_card_num(session, deck) or 1))
+            card_count = 0
+            for card in cards.yield_per(BATCH_SIZE):
+                util.print_card(index_length, card, show_answers)
+                card_count += 1
 
-            index_length = ceil(log10(db.get_max_card_num(session, deck)))
-            for card in cards:
-                _print_single_card(index_length, card, show_answers)
+            if not card_count:
+                print("No cards to show.")
@@ -1,8 +1,7 @@
 import argparse
+from datetime import datetime
 
-import sqlalchemy as sa
-
-from drillsrs import db
+from drillsrs import db, util
 from drillsrs.cmd.command_base import CommandBase
 
 
@@ -12,21 +11,28 @@ class ListDecksCommand(CommandBase):
 
     def run(self, _args: argparse.Namespace) -> None:
         with db.session_scope() as session:
-            if not session.query(db.Deck).count():
+            now = datetime.now()
+            deck_summaries = db.get_deck_summaries(session, now)
+            if not deck_summaries:
                 print("No decks to show.")
                 return
 
-            results = session.query(
-                db.Deck.id, db.Deck.name, db.Deck.description
-            )
-            for deck_id, name, description in results:
-                card_count = (
-                    session.query(sa.func.count(db.Deck.cards))
-                    .join(db.Card)
-                    .filter(db.Deck.id == deck_id)
-                    .scalar()
+            for deck, summary in deck_summaries:
+                details = "%d cards, %d active, %d inactive, %d due now" % (
+                    summary.card_count,
+                    summary.active_card_count,
+                    summary.inactive_card_count,
+                    summary.due_card_count,
                 )
+                if summary.next_due_date and summary.next_due_date > now:
+                    details += ", next review in %s" % util.format_timedelta(
+                        summary.next_due_date - now
+                    )
                 print(
-                    "%s: %s (%d cards)"
-                    % (name, description or "(no description)", card_count)
+                    "%s: %s (%s)"
+                    % (
+                        deck.name,
+                        deck.description or "(no description)",
+                        details,
+                    )
                 )
@@ -1,5 +1,4 @@
 import argparse
-from typing import Any
 
 import sqlalchemy as sa
 
@@ -7,12 +6,7 @@ from drillsrs import db, util
 from drillsrs.cmd.command_base import CommandBase
 
 
-def _print_single_tag(session: Any, index: int, tag: db.Tag) -> None:
-    tag_usages = (
-        session.query(sa.func.count(db.CardTag.tag_id))
-        .filter(db.CardTag.tag_id == tag.id)
-        .scalar()
-    ) or 0
+def _print_single_tag(index: int, tag: db.Tag, tag_usages: int) -> None:
     print("Tag #%d" % (index + 1))
     print("Name:    %s" % tag.name)
     print("Color:   %s" % tag.color)
@@ -34,12 +28,17 @@ class ListTagsCommand(CommandBase):
         with db.session_scope() as session:
             deck = db.get_deck_by_name(session, deck_name)
             tags = (
-                session.query(db.Tag).filter(db.Tag.deck_id == deck.id).all()
+                session.query(db.Tag, sa.func.count(db.CardTag.card_id))
+                .outerjoin(db.CardTag, db.CardTag.tag_id == db.Tag.id)
+                .filter(db.Tag.deck_id == deck.id)
+                .group_by(db.Tag.id)
+                .order_by(db.Tag.id)
+                .all()
             )
 
             if not tags:
                 print("No tags to show.")
                 return
 
-            for i, tag in enumerate(tags):
-                _print_single_tag(session, i, tag)
+            for i, (tag, tag_usages) in enumerate(tags):
+                _print_single_tag(i, tag, tag_usages)
@@ -0,0 +1,19 @@
+import argparse
+
+from drillsrs import db
+from drillsrs.cmd.command_base import CommandBase
+
+
+class RebuildStatsCommand(CommandBase):
+    names = ["rebuild-stats"]
+    description = "recompute the daily statistics of a deck from its history"
+
+    def decorate_arg_parser(self, parser: argparse.ArgumentParser) -> None:
+        parser.add_argument("deck", nargs="?", help="choose the deck name")
+
+    def run(self, args: argparse.Namespace) -> None:
+        deck_name: str = args.deck
+
+        with db.session_scope() as session:
+            deck = db.get_deck_by_name(session, deck_name)
+            db.rebuild_daily_stats(session, deck.id)
@@ -1,26 +1,63 @@
 import argparse
+import collections
+import heapq
+import itertools
 import random
 from datetime import datetime
-from typing import Any, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
-from drillsrs import db, scheduler, util
+from drillsrs import db, journal, scheduler, tag_expr, util
 from drillsrs.cli_args import Mode
 from drillsrs.cmd.command_base import CommandBase
 from drillsrs.question import render_question_prompt
 
 
+class _ReviewQueue:
+    def __init__(self) -> None:
+        self._heap: List[Tuple[float, int, db.Card]] = []
+        self._counter = itertools.count()
+        self._head = 0.0
+        self._tail = 0.0
+        self.deck_counts: Dict[int, int] = collections.Counter()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def _push(self, position: float, card: db.Card) -> None:
+        heapq.heappush(self._heap, (position, next(self._counter), card))
+        self.deck_counts[card.deck_id] += 1
+        self._tail = max(self._tail, position)
+
+    def extend(self, cards: List[db.Card]) -> None:
+        for card in cards:
+            self._push(self._tail + 1, card)
+
+    def pop(self) -> db.Card:
+        self._head, _, card = heapq.heappop(self._heap)
+        self.deck_counts[card.deck_id] -= 1
+        return card
+
+    def requeue(self, card: db.Card) -> None:
+        # somewhere in the back half of the cards that are still queued
+        self._push(
+            random.uniform((self._head + self._tail) / 2, self._tail + 1), card
+        )
+
+
 def _review_single_card(
     index: int,
+    cards_left_count: int,
     correct_answer_count: int,
-    cards_to_review: List[db.Card],
     card: db.Card,
     mode: Mode,
+    deck_progress: str,
 ) -> db.UserAnswer:
     print(
-        "Card #{} ({:.01%} done, {} left, {:.01%} correct)".format(
+        "Card #{} ({}{:.01%} done, {} left, {:.01%} correct)".format(
             card.num,
-            index / len(cards_to_review),
-            len(cards_to_review) - index,
+            deck_progress,
+            index / (index + cards_left_count),
+            cards_left_count,
             correct_answer_count / max(1, index),
         )
     )
@@ -73,26 +110,35 @@ def _review_single_card(
 
 
 def _review(
-    session: Any, deck: db.Deck, how_many: Optional[int], mode: Mode
+    session: Any,
+    answer_journal: journal.AnswerJournal,
+    decks: List[db.Deck],
+    how_many: Optional[int],
+    mode: Mode,
+    tag_filter: Any,
 ) -> None:
+    deck_names = {deck.id: deck.name for deck in decks}
     first_iteration = True
     cards_left = how_many
+    queue = _ReviewQueue()
+    last_check: Optional[datetime] = None
     while True:
-        cards_to_review = scheduler.get_cards_to_review(session, deck)
-        random.shuffle(cards_to_review)
-        if cards_left is not None:
-            cards_to_review = cards_to_review[0:cards_left]
+        now = datetime.now()
+        cards_to_review = scheduler.get_cards_to_review(
+            session, decks, cards_left, tag_filter, since=last_check, now=now
+        )
+        last_check = now
 
         if not cards_to_review:
-            due_cards = scheduler.get_due_cards(session, deck)
+            next_due_date = scheduler.get_next_due_date(
+                session, decks, tag_filter
+            )
 
             if first_iteration:
                 print("No cards to review.")
             else:
                 print("No more cards to review.")
-            if due_cards:
-                next_due_date = due_cards[0].due_date
-                assert next_due_date
+            if next_due_date:
                 print(
                     "Next review in %s."
                     % util.format_timedelta(next_due_date - datetime.now())
@@ -103,29 +149,36 @@ def _review(
             print("%d cards to review." % len(cards_to_review))
             print()
 
+        queue.extend(cards_to_review)
         index = 0
         correct_answer_count = 0
-        while index < len(cards_to_review):
-            card = cards_to_review[index]
+        while queue:
+            card = queue.pop()
+            deck_progress = ""
+            if len(decks) > 1:
+                deck_progress = "%s: %d left, " % (
+                    deck_names[card.deck_id],
+                    queue.deck_counts[card.deck_id] + 1,
+                )
             user_answer = _review_single_card(
-                index, correct_answer_count, cards_to_review, card, mode
+                index,
+                len(queue) + 1,
+                correct_answer_count,
+                card,
+                mode,
+                deck_progress,
             )
-            card.user_answers.append(user_answer)
+            scheduler.answer_card(card, user_answer)
+            answer_journal.append(card, user_answer)
             index += 1
             if user_answer.is_correct:
-                card.due_date = scheduler.next_due_date(card)
                 correct_answer_count += 1
                 if cards_left is not None:
                     cards_left -= 1
             else:
-                cards_to_review.insert(
-                    random.randint(
-                        index + ((len(cards_to_review) - index) // 2),
-                        len(cards_to_review),
-                    ),
-                    card,
-                )
-            session.commit()
+                queue.requeue(card)
+            answer_journal.commit_if_due(session)
+        answer_journal.commit(session)
 
         first_iteration = False
 
@@ -135,7 +188,13 @@ class ReviewCommand(CommandBase):
     description = "begin a review session"
 
     def decorate_arg_parser(self, parser: argparse.ArgumentParser) -> None:
-        parser.add_argument("deck", nargs="?", help="choose the deck name")
+        parser.add_argument("deck", nargs="*", help="choose the deck names")
+        parser.add_argument(
+            "-a",
+            "--all-decks",
+            action="store_true",
+            help="review cards from all decks in one session",
+        )
         parser.add_argument(
             "-n",
             type=int,
@@ -150,11 +209,28 @@ class ReviewCommand(CommandBase):
             choices=list(Mode),
             help="learning mode. whether to involve reversed direction",
         )
+        parser.add_argument(
+            "-t",
+            "--tag",
+            help=(
+                "restrict to cards matching a tag expression, "
+                "e.g. 'verb and (n5 or n4) and not rare'"
+            ),
+        )
 
     def run(self, args: argparse.Namespace) -> None:
-        deck_name: str = args.deck
+        deck_names: List[str] = args.deck
+        all_decks: bool = args.all_decks
         how_many: Optional[int] = args.n
         mode: Mode = args.mode
+        tag: Optional[str] = args.tag
         with db.session_scope() as session:
-            deck = db.get_deck_by_name(session, deck_name)
-            _review(session, deck, how_many, mode)
+            decks = db.get_decks_by_names(session, deck_names, all_decks)
+            tag_filter = tag_expr.get_tag_filter(session, decks, tag)
+            answer_journal = journal.AnswerJournal()
+            try:
+                _review(
+                    session, answer_journal, decks, how_many, mode, tag_filter
+                )
+            finally:
+                answer_journal.close(session)
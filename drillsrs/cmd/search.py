@@ -0,0 +1,48 @@
+import argparse
+from math import ceil, log10
+from typing import Optional
+
+from drillsrs import db, search, util
+from drillsrs.cmd.command_base import CommandBase
+
+
+class SearchCommand(CommandBase):
+    names = ["search"]
+    description = "search flashcards by question and answer text"
+
+    def decorate_arg_parser(self, parser: argparse.ArgumentParser) -> None:
+        parser.add_argument("deck", nargs="?", help="choose the deck name")
+        parser.add_argument(
+            "query",
+            help=(
+                'text to look for; supports "phrases", prefix* terms '
+                "and AND/OR/NOT"
+            ),
+        )
+        parser.add_argument(
+            "-n",
+            type=int,
+            default=20,
+            help="set max number how many flashcards to show",
+        )
+        parser.add_argument(
+            "--show-answers", action="store_true", help="show answers text"
+        )
+
+    def run(self, args: argparse.Namespace) -> None:
+        deck_name: str = args.deck
+        query: str = args.query
+        how_many: Optional[int] = args.n
+        show_answers: bool = args.show_answers
+
+        with db.session_scope() as session:
+            deck = db.get_deck_by_name(session, deck_name)
+            cards = search.search_cards(session, deck, query, how_many)
+
+            if not cards:
+                print("No cards to show.")
+                return
+
+            index_length = ceil(log10(db.get_max_card_num(session, deck)))
+            for card in cards:
+                util.print_card(index_length, card, show_answers)
@@ -1,15 +1,19 @@
 import argparse
 import json
+import os
 import sys
 from datetime import datetime, timedelta
-from typing import Any, List, Tuple, Union
+from typing import Any, List, Optional, Tuple, Union
 
 import jinja2
 import sqlalchemy as sa
+import xdg
 
-from drillsrs import db, util
+from drillsrs import db
 from drillsrs.cmd.command_base import CommandBase
 
+_environment: Optional[jinja2.Environment] = None
+
 
 class HistoryItem:
     def __init__(
@@ -35,22 +39,26 @@ def _percent(count: Union[int, float], max_count: Union[int, float]) -> str:
     return "%.02f" % fraction
 
 
+class _DateEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if hasattr(obj, "isoformat"):
+            return obj.isoformat()
+        if type(obj) is HistoryItem:
+            return {
+                "date": obj.date,
+                "new_active_card_count": obj.new_active_card_count,
+                "total_active_card_count": obj.total_active_card_count,
+                "correct_answer_count": obj.correct_answer_count,
+                "incorrect_answer_count": obj.incorrect_answer_count,
+            }
+        return json.JSONEncoder.default(self, obj)
+
+
+_json_encoder = _DateEncoder()
+
+
 def _to_json(input: Any) -> str:
-    class DateEncoder(json.JSONEncoder):
-        def default(self, obj):
-            if hasattr(obj, "isoformat"):
-                return obj.isoformat()
-            if type(obj) is HistoryItem:
-                return {
-                    "date": obj.date,
-                    "new_active_card_count": obj.new_active_card_count,
-                    "total_active_card_count": obj.total_active_card_count,
-                    "correct_answer_count": obj.correct_answer_count,
-                    "incorrect_answer_count": obj.incorrect_answer_count,
-                }
-            return json.JSONEncoder.default(self, obj)
-
-    return json.dumps(input, cls=DateEncoder)
+    return _json_encoder.encode(input)
 
 
 def _format_tags(tags: List[db.Tag]) -> str:
@@ -64,128 +72,50 @@ def _comparer(card: db.Card) -> Any:
     return card.incorrect_answer_count, -card.correct_answer_count
 
 
-def _get_max_answer_count(session: Any, deck: db.Deck) -> int:
-    tmp = sa.func.count(db.UserAnswer.id).label("cnt")
-    return (
-        session.query(tmp)
-        .join(db.Card)
-        .join(db.Deck)
-        .group_by(db.Card.id)
-        .filter(db.Deck.id == deck.id)
-        .order_by(tmp.desc())
-        .limit(1)
-        .scalar()
-    )
-
-
-def _get_correct_answer_count(session: Any, deck: db.Deck) -> int:
-    return (
-        session.query(sa.func.count(db.UserAnswer.id))
-        .join(db.Card)
-        .join(db.Deck)
-        .filter(db.UserAnswer.is_correct == 1)
-        .filter(db.Deck.id == deck.id)
-        .scalar()
-    )
-
-
-def _get_incorrect_answer_count(session: Any, deck: db.Deck) -> int:
-    return (
-        session.query(sa.func.count(db.UserAnswer.id))
-        .join(db.Card)
-        .join(db.Deck)
-        .filter(db.UserAnswer.is_correct == 0)
-        .filter(db.Deck.id == deck.id)
-        .scalar()
-    )
-
-
-def _get_active_card_count(session: Any, deck: db.Deck) -> int:
-    return (
-        session.query(sa.func.count(db.Card.id))
-        .join(db.Deck)
-        .filter(db.Card.is_active == 1)
-        .filter(db.Deck.id == deck.id)
-        .scalar()
-    )
-
-
-def _get_inactive_card_count(session: Any, deck: db.Deck) -> int:
-    return (
-        session.query(sa.func.count(db.Card.id))
-        .join(db.Deck)
-        .filter(db.Card.is_active == 0)
-        .filter(db.Deck.id == deck.id)
-        .scalar()
-    )
-
-
 def _get_learning_history(session: Any, deck: db.Deck) -> List[HistoryItem]:
     threshold = 365
-
-    date_to_activated_card_count_map = {
-        result[0].date(): result[1]
-        for result in (
-            session.query(db.Card.activation_date, sa.func.count(db.Card.id))
-            .filter(db.Card.activation_date != None)
-            .filter(
-                db.Card.activation_date
-                >= datetime.today() - timedelta(days=threshold)
-            )
-            .group_by(sa.func.strftime("%Y-%m-%d", db.Card.activation_date))
-            .all()
-        )
-    }
-
-    if date_to_activated_card_count_map:
-        first_day = sorted(date_to_activated_card_count_map.keys())[0]
-        threshold = min(
-            threshold, (datetime.today().date() - first_day).days + 1
-        )
+    today = datetime.today().date()
+    stats = db.DeckDailyStats
+
+    first_day = (
+        session.query(sa.func.min(stats.day))
+        .filter(stats.deck_id == deck.id)
+        .filter(stats.new_active_card_count > 0)
+        .filter(stats.day > today - timedelta(days=threshold))
+        .scalar()
+    )
+    if first_day:
+        threshold = min(threshold, (today - first_day).days + 1)
     else:
         threshold = 1
+    start_day = today - timedelta(days=threshold - 1)
 
-    date_to_answer_count_map = {
-        (result[0].date(), result[1]): result[2]
-        for result in (
-            session.query(
-                db.UserAnswer.date,
-                db.UserAnswer.is_correct,
-                sa.func.count(db.UserAnswer.id),
-            )
-            .filter(db.UserAnswer.date != None)
-            .filter(
-                db.UserAnswer.date
-                >= datetime.today() - timedelta(days=threshold)
-            )
-            .group_by(
-                sa.func.strftime("%Y-%m-%d", db.UserAnswer.date),
-                db.UserAnswer.is_correct,
-            )
-            .all()
-        )
+    total_active_card_count = (
+        session.query(sa.func.sum(stats.new_active_card_count))
+        .filter(stats.deck_id == deck.id)
+        .filter(stats.day < start_day)
+        .scalar()
+    ) or 0
+    day_stats = {
+        row.day: row
+        for row in session.query(stats)
+        .filter(stats.deck_id == deck.id)
+        .filter(stats.day >= start_day)
     }
 
     ret: List[HistoryItem] = []
-    total_active_card_count = (
-        session.query(sa.func.count(db.Card.id))
-        .filter(
-            db.Card.activation_date
-            < datetime.today() - timedelta(days=threshold)
-        )
-        .scalar()
-    )
     for delta in reversed(range(threshold)):
-        date = datetime.today().date() - timedelta(days=delta)
-        new_active_card_count = date_to_activated_card_count_map.get(date, 0)
+        date = today - timedelta(days=delta)
+        row = day_stats.get(date)
+        new_active_card_count = row.new_active_card_count if row else 0
         total_active_card_count += new_active_card_count
         ret.append(
             HistoryItem(
                 date,
                 new_active_card_count,
                 total_active_card_count,
-                date_to_answer_count_map.get((date, True), 0),
-                date_to_answer_count_map.get((date, False), 0),
+                row.correct_answer_count if row else 0,
+                row.incorrect_answer_count if row else 0,
             )
         )
     return ret
@@ -194,38 +124,53 @@ def _get_learning_history(session: Any, deck: db.Deck) -> List[HistoryItem]:
 def _get_bad_cards(
     session: Any, deck: db.Deck, threshold: float
 ) -> List[db.Card]:
-    ratio = db.Card.correct_answer_count * 1.0 / db.Card.total_answer_count
+    ratio = db.Card.correct_answer_ratio
     return list(
         session.query(db.Card)
-        .join(db.Deck)
-        .filter(db.Deck.id == deck.id)
+        .filter(db.Card.deck_id == deck.id)
         .filter(ratio < threshold)
+        .options(sa.orm.selectinload(db.Card.tags))
         .order_by(ratio.asc())
         .all()
     )
 
 
+def _get_environment() -> jinja2.Environment:
+    global _environment
+    if _environment is None:
+        cache_dir = os.path.join(xdg.XDG_CACHE_HOME, "drillsrs", "templates")
+        os.makedirs(cache_dir, exist_ok=True)
+        _environment = jinja2.Environment(
+            loader=jinja2.PackageLoader("drillsrs", "data"),
+            bytecode_cache=jinja2.FileSystemBytecodeCache(cache_dir),
+        )
+        _environment.globals["percent"] = _percent
+        _environment.globals["tags"] = _format_tags
+        _environment.globals["tojson"] = _to_json
+    return _environment
+
+
 def _write_report(deck: db.Deck, session: Any, output_handle: Any) -> None:
-    template = jinja2.Template(util.get_data("stats.tpl"))
-    template.globals["percent"] = _percent
-    template.globals["tags"] = _format_tags
-    template.globals["tojson"] = _to_json
+    template = _get_environment().get_template("stats.tpl")
 
     bad_cards_threshold = 0.75
 
-    text = template.render(
+    summary = db.get_deck_summary(session, deck)
+    chunks = template.generate(
         deck=deck,
         date=datetime.now(),
         learning_history=_get_learning_history(session, deck),
         bad_cards_threshold=bad_cards_threshold,
         bad_cards=_get_bad_cards(session, deck, bad_cards_threshold),
-        max_answer_count=_get_max_answer_count(session, deck),
-        active_card_count=_get_active_card_count(session, deck),
-        inactive_card_count=_get_inactive_card_count(session, deck),
-        correct_answer_count=_get_correct_answer_count(session, deck),
-        incorrect_answer_count=_get_incorrect_answer_count(session, deck),
+        max_answer_count=summary.max_answer_count,
+        active_card_count=summary.active_card_count,
+        inactive_card_count=summary.inactive_card_count,
+        correct_answer_count=summary.correct_answer_count,
+        incorrect_answer_count=summary.incorrect_answer_count,
     )
-    print(text, file=output_handle)
+    for chunk in chunks:
+        output_handle.write(chunk)
+    output_handle.write("\n")
 
 
 class StatsCommand(CommandBase):
@@ -1,19 +1,28 @@
 import argparse
+import collections
 import random
 from datetime import datetime
+from typing import List, Optional
 
-from drillsrs import db, scheduler, util
+from drillsrs import db, scheduler, tag_expr, util
 from drillsrs.cli_args import Mode
 from drillsrs.cmd.command_base import CommandBase
 from drillsrs.question import render_question_prompt
 
 
 def _learn_single_card(
-    index: int, num_cards_to_study: int, card: db.Card, mode: Mode
+    index: int,
+    num_cards_to_study: int,
+    card: db.Card,
+    mode: Mode,
+    deck_progress: str,
 ) -> None:
     print(
-        "Card #{} ({:.01%} done, {} left)".format(
-            card.num, index / num_cards_to_study, num_cards_to_study - index
+        "Card #{} ({}{:.01%} done, {} left)".format(
+            card.num,
+            deck_progress,
+            index / num_cards_to_study,
+            num_cards_to_study - index,
         )
     )
 
@@ -36,7 +45,13 @@ class StudyCommand(CommandBase):
     description = "begin a study session"
 
     def decorate_arg_parser(self, parser: argparse.ArgumentParser) -> None:
-        parser.add_argument("deck", nargs="?", help="choose the deck name")
+        parser.add_argument("deck", nargs="*", help="choose the deck names")
+        parser.add_argument(
+            "-a",
+            "--all-decks",
+            action="store_true",
+            help="study cards from all decks in one session",
+        )
         parser.add_argument(
             "-n", type=int, default=10, help="set how many flashcards to study"
         )
@@ -48,16 +63,27 @@ class StudyCommand(CommandBase):
             choices=list(Mode),
             help="learning mode. whether to involve reversed direction",
         )
+        parser.add_argument(
+            "-t",
+            "--tag",
+            help=(
+                "restrict to cards matching a tag expression, "
+                "e.g. 'verb and (n5 or n4) and not rare'"
+            ),
+        )
 
     def run(self, args: argparse.Namespace) -> None:
-        deck_name: str = args.deck
+        deck_names: List[str] = args.deck
+        all_decks: bool = args.all_decks
         how_many: int = args.n
         mode: Mode = args.mode
+        tag: Optional[str] = args.tag
 
         with db.session_scope() as session:
-            deck = db.get_deck_by_name(session, deck_name)
+            decks = db.get_decks_by_names(session, deck_names, all_decks)
+            tag_filter = tag_expr.get_tag_filter(session, decks, tag)
             cards_to_study = scheduler.get_cards_to_study(
-                session, deck, how_many
+                session, decks, how_many, tag_filter
             )
 
             if not cards_to_study:
@@ -70,6 +96,19 @@ class StudyCommand(CommandBase):
             )
             print()
 
+            deck_names = {deck.id: deck.name for deck in decks}
+            deck_counts = collections.Counter(
+                card.deck_id for card in cards_to_study
+            )
             num_cards_to_study = len(cards_to_study)
             for index, card in enumerate(cards_to_study):
-                _learn_single_card(index, num_cards_to_study, card, mode)
+                deck_progress = ""
+                if len(decks) > 1:
+                    deck_progress = "%s: %d left, " % (
+                        deck_names[card.deck_id],
+                        deck_counts[card.deck_id],
+                    )
+                deck_counts[card.deck_id] -= 1
+                _learn_single_card(
+                    index, num_cards_to_study, card, mode, deck_progress
+                )
@@ -22,9 +22,12 @@ class UpdateCardCommand(CommandBase):
             "-t", "--tag", nargs="*", help="set the tags of the card"
         )
         parser.add_argument(
+            "--move-to",
             "--new-id",
+            dest="move_to",
+            metavar="ID",
             type=int,
-            help="move the card to desired place in the deck",
+            help="move the card to the place of the card with the given id",
         )
 
     def run(self, args: argparse.Namespace) -> None:
@@ -33,11 +36,16 @@ class UpdateCardCommand(CommandBase):
         question: Optional[str] = args.question
         answers: Optional[List[str]] = args.answer
         tags: Optional[List[str]] = args.tag
-        new_num: Optional[int] = args.new_id
+        target_num: Optional[int] = args.move_to
 
         with db.session_scope() as session:
             deck = db.get_deck_by_name(session, deck_name)
             card = db.get_card_by_num(session, deck, num)
+            target = (
+                db.get_card_by_num(session, deck, target_num)
+                if target_num is not None
+                else None
+            )
 
             if not util.confirm(
                 "Are you sure you want to update card #%d (%r)?"
@@ -56,5 +64,5 @@ class UpdateCardCommand(CommandBase):
                     db.get_tag_by_name(session, deck, tag) for tag in tags
                 ]
 
-            if new_num is not None:
-                db.move_card(session, card, new_num)
+            if target is not None:
+                db.move_card(session, deck, card, target)
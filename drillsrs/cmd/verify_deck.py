@@ -0,0 +1,76 @@
+import argparse
+from typing import Any, Dict
+
+import sqlalchemy as sa
+
+from drillsrs import db, scheduler
+from drillsrs.cmd.command_base import CommandBase
+
+
+def _get_expected_state(card: db.Card) -> Dict[str, Any]:
+    user_answers = card.user_answers
+    correct_answer_count = len([ua for ua in user_answers if ua.is_correct])
+    score, streak = scheduler.replay_answers(user_answers)
+    return {
+        "first_answer_date": min(
+            (ua.date for ua in user_answers), default=None
+        ),
+        "last_answer_date": user_answers[-1].date if user_answers else None,
+        "total_answer_count": len(user_answers),
+        "correct_answer_count": correct_answer_count,
+        "incorrect_answer_count": len(user_answers) - correct_answer_count,
+        "score": score,
+        "streak": streak,
+    }
+
+
+class VerifyDeckCommand(CommandBase):
+    names = ["verify-deck"]
+    description = "check the cards' stored state against their answer history"
+
+    def decorate_arg_parser(self, parser: argparse.ArgumentParser) -> None:
+        parser.add_argument("deck", nargs="?", help="choose the deck name")
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="overwrite inconsistent state with the replayed one",
+        )
+
+    def run(self, args: argparse.Namespace) -> None:
+        deck_name: str = args.deck
+        fix: bool = args.fix
+
+        with db.session_scope() as session:
+            deck = db.get_deck_by_name(session, deck_name)
+            cards = (
+                session.query(db.Card)
+                .filter(db.Card.deck_id == deck.id)
+                .options(sa.orm.selectinload(db.Card.user_answers))
+                .order_by(db.Card.num.asc())
+            )
+
+            card_count = 0
+            bad_card_count = 0
+            for card in cards:
+                card_count += 1
+                expected_state = _get_expected_state(card)
+                mismatches = [
+                    (key, getattr(card, key), value)
+                    for key, value in expected_state.items()
+                    if getattr(card, key) != value
+                ]
+                if not mismatches:
+                    continue
+                bad_card_count += 1
+                for key, actual, expected in mismatches:
+                    print(
+                        "Card #%d: %s is %r, expected %r"
+                        % (card.num, key, actual, expected)
+                    )
+                    if fix:
+                        setattr(card, key, expected)
+
+            print(
+                "%d card(s) checked, %d inconsistent%s."
+                % (card_count, bad_card_count, " (fixed)" if fix else "")
+            )
@@ -0,0 +1,214 @@
+import contextlib
+import errno
+import io
+import json
+import os
+import socket
+import struct
+import sys
+import traceback
+from typing import Any, Callable, List, Optional
+
+from drillsrs import error, paths
+
+# commands that neither prompt nor read standard input
+SERVED_COMMANDS = {
+    "how-to",
+    "list-decks",
+    "list-tags",
+    "list-cards",
+    "search",
+    "stats",
+    "export",
+    "verify-deck",
+}
+BUFFER_SIZE = 65536
+TIMEOUT = 5.0
+
+# every reply frame is a channel and a length; for ACCEPTED and EXIT no
+# payload follows and EXIT carries the exit status in the length field
+FRAME_HEADER = struct.Struct("!BI")
+ACCEPTED = 0
+STDOUT = 1
+STDERR = 2
+EXIT = 3
+
+
+def get_socket_path() -> str:
+    return os.path.join(paths.get_data_dir(), "daemon.sock")
+
+
+def _connect() -> socket.socket:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(TIMEOUT)
+        sock.connect(get_socket_path())
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(min(size - len(data), BUFFER_SIZE))
+        if not chunk:
+            raise ConnectionResetError(errno.ECONNRESET, "connection closed")
+        data += chunk
+    return bytes(data)
+
+
+def _read_reply(sock: socket.socket) -> int:
+    while True:
+        channel, size = FRAME_HEADER.unpack(
+            _recv_exactly(sock, FRAME_HEADER.size)
+        )
+        if channel == EXIT:
+            return size
+        stream = sys.stdout if channel == STDOUT else sys.stderr
+        stream.buffer.write(_recv_exactly(sock, size))
+        stream.buffer.flush()
+
+
+def run_remote(argv: List[str]) -> Optional[int]:
+    if not argv or argv[0] not in SERVED_COMMANDS:
+        return None
+    try:
+        sock = _connect()
+    except OSError:
+        return None
+    with sock:
+        request = {"argv": argv, "cwd": os.getcwd()}
+        try:
+            sock.sendall(json.dumps(request).encode() + b"\n")
+            sock.shutdown(socket.SHUT_WR)
+            channel, _ = FRAME_HEADER.unpack(
+                _recv_exactly(sock, FRAME_HEADER.size)
+            )
+            if channel != ACCEPTED:
+                return None
+        except OSError:
+            # the daemon is busy or hung, do the work ourselves
+            return None
+        # the command may take its time from here on
+        sock.settimeout(None)
+        try:
+            return _read_reply(sock)
+        except IOError as ex:
+            if ex.errno == errno.EPIPE:
+                return 0
+            print("The daemon closed the connection.", file=sys.stderr)
+        return 1
+
+
+class _FrameWriter(io.RawIOBase):
+    def __init__(self, sock: socket.socket, channel: int) -> None:
+        super().__init__()
+        self._sock = sock
+        self._channel = channel
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        self._sock.sendall(
+            FRAME_HEADER.pack(self._channel, len(data)) + bytes(data)
+        )
+        return len(data)
+
+
+def _open_stream(sock: socket.socket, channel: int) -> io.TextIOWrapper:
+    return io.TextIOWrapper(
+        io.BufferedWriter(_FrameWriter(sock, channel), BUFFER_SIZE),
+        encoding="utf-8",
+    )
+
+
+def _run_request(
+    line: bytes, parser: Any, execute: Callable[[Any, Any], int]
+) -> int:
+    try:
+        request = json.loads(line)
+        argv: List[str] = request["argv"]
+        cwd: str = request["cwd"]
+        if not isinstance(argv, list) or not isinstance(cwd, str):
+            raise TypeError()
+    except (ValueError, KeyError, TypeError):
+        print("Malformed request.", file=sys.stderr)
+        return 2
+    if not argv or argv[0] not in SERVED_COMMANDS:
+        print("This command can't be run by the daemon.", file=sys.stderr)
+        return 2
+
+    old_cwd = os.getcwd()
+    try:
+        os.chdir(cwd)
+        args = parser.parse_args(argv)
+        return execute(args.command_cls, args)
+    except SystemExit as ex:
+        return ex.code if isinstance(ex.code, int) else int(bool(ex.code))
+    except Exception:
+        traceback.print_exc()
+        return 1
+    finally:
+        os.chdir(old_cwd)
+
+
+def _handle(
+    conn: socket.socket, parser: Any, execute: Callable[[Any, Any], int]
+) -> None:
+    with conn.makefile("rb") as rfile:
+        line = rfile.readline()
+    if not line:
+        return
+    # the timeout only guards the request, the client may read slowly
+    conn.settimeout(None)
+    conn.sendall(FRAME_HEADER.pack(ACCEPTED, 0))
+    with _open_stream(conn, STDOUT) as stdout, _open_stream(
+        conn, STDERR
+    ) as stderr:
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(
+            stderr
+        ):
+            status = _run_request(line, parser, execute)
+    conn.sendall(FRAME_HEADER.pack(EXIT, status))
+
+
+def _bind() -> socket.socket:
+    path = get_socket_path()
+    try:
+        _connect().close()
+    except OSError:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(path)
+    else:
+        raise error.DrillError("The daemon is already running.")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    umask = os.umask(0o077)
+    try:
+        sock.bind(path)
+    finally:
+        os.umask(umask)
+    sock.listen(16)
+    return sock
+
+
+def serve(parser: Any, execute: Callable[[Any, Any], int]) -> None:
+    server = _bind()
+    print("Listening on %s." % get_socket_path())
+    sys.stdout.flush()
+    try:
+        while True:
+            conn, _ = server.accept()
+            conn.settimeout(TIMEOUT)
+            with conn:
+                try:
+                    _handle(conn, parser, execute)
+                except OSError:
+                    # the client went away before reading everything
+                    continue
+    finally:
+        server.close()
+        os.unlink(get_socket_path())
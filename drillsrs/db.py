@@ -1,29 +1,82 @@
+import json
 import os
+import re
+import sys
 from contextlib import contextmanager
-from datetime import datetime
-from typing import Any, Generator, List, Optional
+from datetime import date, datetime
+from typing import Any, Dict, Generator, List, NamedTuple, Optional, Tuple
 
 import sqlalchemy as sa
 import sqlalchemy.ext.declarative
 import sqlalchemy.ext.mutable
 import sqlalchemy.orm
-import xdg
 
-from drillsrs import error
+from drillsrs import error, paths
 
 
-def get_db_path() -> str:
-    return os.path.join(xdg.XDG_DATA_HOME, "drillsrs/decks.sqlite")
+def json_serializer(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False)
 
 
-engine: Any = sa.create_engine("sqlite:///%s" % os.path.abspath(get_db_path()))
-session_maker: Any = sa.orm.session.sessionmaker(bind=engine, autoflush=False)
+SQLITE_PRAGMAS_ENV = "DRILLSRS_SQLITE_PRAGMAS"
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": "268435456",
+    "cache_size": "-16384",
+    "busy_timeout": "5000",
+    "foreign_keys": "ON",
+}
+
+
+def get_sqlite_pragmas() -> Dict[str, str]:
+    pragmas = dict(SQLITE_PRAGMAS)
+    for item in os.environ.get(SQLITE_PRAGMAS_ENV, "").split(","):
+        if not item.strip():
+            continue
+        key, _sep, value = item.partition("=")
+        key, value = key.strip().lower(), value.strip()
+        if not re.fullmatch(r"[a-z_]+", key) or not re.fullmatch(
+            r"-?\w+", value
+        ):
+            raise error.DrillError(
+                "Invalid SQLite pragma in %s: %r" % (SQLITE_PRAGMAS_ENV, item)
+            )
+        pragmas[key] = value
+    return pragmas
+
+
+def _apply_sqlite_pragmas(dbapi_connection: Any, _record: Any) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        for key, value in get_sqlite_pragmas().items():
+            cursor.execute("PRAGMA %s = %s" % (key, value))
+            if key != "journal_mode":
+                continue
+            # SQLite stays in its old mode when it can't switch, e.g. WAL on
+            # a file system without shared memory
+            mode = cursor.fetchone()[0]
+            if mode.lower() != value.lower():
+                print(
+                    "Can't use journal_mode=%s for the database, "
+                    "falling back to DELETE." % value,
+                    file=sys.stderr,
+                )
+                cursor.execute("PRAGMA journal_mode = DELETE")
+    finally:
+        cursor.close()
+
+
+RANK_GAP = 1 << 16
+
+_engine: Optional[Any] = None
+session_maker: Any = sa.orm.session.sessionmaker(autoflush=False)
 Base: Any = sa.ext.declarative.declarative_base()
 
 
 @contextmanager
 def session_scope() -> Generator:
-    session = session_maker()
+    session = session_maker(bind=get_engine())
     try:
         yield session
         session.commit()
@@ -41,7 +94,7 @@ class UserAnswer(Base):
     card_id: int = sa.Column(
         "card_id",
         sa.Integer,
-        sa.ForeignKey("card.id"),
+        sa.ForeignKey("card.id", ondelete="CASCADE"),
         nullable=False,
         index=True,
     )
@@ -55,7 +108,7 @@ class CardTag(Base):
     card_id = sa.Column(
         "card_id",
         sa.Integer,
-        sa.ForeignKey("card.id"),
+        sa.ForeignKey("card.id", ondelete="CASCADE"),
         primary_key=True,
         nullable=False,
         index=True,
@@ -63,7 +116,7 @@ class CardTag(Base):
     tag_id = sa.Column(
         "tag_id",
         sa.Integer,
-        sa.ForeignKey("tag.id"),
+        sa.ForeignKey("tag.id", ondelete="CASCADE"),
         primary_key=True,
         nullable=False,
         index=True,
@@ -77,7 +130,7 @@ class Tag(Base):
     deck_id: int = sa.Column(
         "deck_id",
         sa.Integer,
-        sa.ForeignKey("deck.id"),
+        sa.ForeignKey("deck.id", ondelete="CASCADE"),
         nullable=False,
         index=True,
     )
@@ -87,80 +140,237 @@ class Tag(Base):
 
 class Card(Base):
     __tablename__ = "card"
+    __table_args__ = (
+        sa.Index(
+            "ix_card_deck_id_active_due_date", "deck_id", "active", "due_date"
+        ),
+        sa.Index("ix_card_deck_id_num", "deck_id", "num"),
+        sa.Index("ix_card_deck_id_rank", "deck_id", "rank"),
+    )
 
     id: int = sa.Column("id", sa.Integer, primary_key=True)
     deck_id: int = sa.Column(
         "deck_id",
         sa.Integer,
-        sa.ForeignKey("deck.id"),
+        sa.ForeignKey("deck.id", ondelete="CASCADE"),
         nullable=False,
         index=True,
     )
     num: int = sa.Column("num", sa.Integer, nullable=False)
+    rank: int = sa.Column("rank", sa.Integer, nullable=False)
     question: str = sa.Column("question", sa.String, nullable=False)
     answers: List[str] = sa.Column(
         "answers",
-        sa.ext.mutable.MutableList.as_mutable(sa.PickleType),
+        sa.ext.mutable.MutableList.as_mutable(sa.JSON),
         nullable=False,
     )
     is_active: bool = sa.Column("active", sa.Boolean, nullable=False)
     activation_date: datetime = sa.Column(
         "activation_date", sa.DateTime, nullable=True, index=True
     )
-    user_answers = sa.orm.relationship(UserAnswer, cascade="all, delete")
-    tags = sa.orm.relationship("Tag", backref="cards", secondary="card_tag")
+    user_answers = sa.orm.relationship(
+        UserAnswer,
+        cascade="all, delete",
+        passive_deletes=True,
+        backref="card",
+        order_by=UserAnswer.id,
+    )
+    tags = sa.orm.relationship(
+        "Tag",
+        backref=sa.orm.backref("cards", passive_deletes=True),
+        secondary="card_tag",
+        passive_deletes=True,
+    )
     due_date: Optional[datetime] = sa.Column(
         "due_date", sa.DateTime, nullable=True
     )
 
-    first_answer_date = sa.orm.column_property(
-        sa.sql.expression.select([sa.sql.expression.func.min(UserAnswer.date)])
-        .where(UserAnswer.card_id == id)
-        .correlate_except(UserAnswer)
-        .scalar_subquery()
+    first_answer_date: Optional[datetime] = sa.Column(
+        "first_answer_date", sa.DateTime, nullable=True
     )
-
-    total_answer_count = sa.orm.column_property(
-        sa.sql.expression.select([sa.sql.expression.func.count(UserAnswer.id)])
-        .where(UserAnswer.card_id == id)
-        .correlate_except(UserAnswer)
-        .scalar_subquery()
+    total_answer_count: int = sa.Column(
+        "total_answer_count",
+        sa.Integer,
+        nullable=False,
+        default=0,
+        server_default="0",
     )
-
-    correct_answer_count = sa.orm.column_property(
-        sa.sql.expression.select([sa.sql.expression.func.count(UserAnswer.id)])
-        .where(UserAnswer.card_id == id)
-        .where(UserAnswer.is_correct == 1)
-        .correlate_except(UserAnswer)
-        .scalar_subquery()
+    correct_answer_count: int = sa.Column(
+        "correct_answer_count",
+        sa.Integer,
+        nullable=False,
+        default=0,
+        server_default="0",
     )
-
-    incorrect_answer_count = sa.orm.column_property(
-        sa.sql.expression.select([sa.sql.expression.func.count(UserAnswer.id)])
-        .where(UserAnswer.card_id == id)
-        .where(UserAnswer.is_correct == 0)
-        .correlate_except(UserAnswer)
-        .scalar_subquery()
+    incorrect_answer_count: int = sa.Column(
+        "incorrect_answer_count",
+        sa.Integer,
+        nullable=False,
+        default=0,
+        server_default="0",
+    )
+    last_answer_date: Optional[datetime] = sa.Column(
+        "last_answer_date", sa.DateTime, nullable=True
+    )
+    score: int = sa.Column(
+        "score", sa.Integer, nullable=False, default=0, server_default="0"
+    )
+    streak: int = sa.Column(
+        "streak", sa.Integer, nullable=False, default=0, server_default="0"
+    )
+    correct_answer_ratio: float = sa.orm.column_property(
+        sa.cast(correct_answer_count, sa.Float) / total_answer_count,
+        deferred=True,
     )
 
 
+sa.Index(
+    "ix_card_deck_id_correct_answer_ratio",
+    Card.deck_id,
+    sa.cast(Card.correct_answer_count, sa.Float) / Card.total_answer_count,
+)
+
+
 class Deck(Base):
     __tablename__ = "deck"
 
     id: int = sa.Column("id", sa.Integer, primary_key=True)
     cards: List[Card] = sa.orm.relationship(
-        Card, cascade="all, delete", backref="deck"
+        Card,
+        cascade="all, delete",
+        passive_deletes=True,
+        backref="deck",
+        order_by=Card.rank,
+    )
+    tags: List[Tag] = sa.orm.relationship(
+        Tag, cascade="all, delete", passive_deletes=True
     )
-    tags: List[Tag] = sa.orm.relationship(Tag, cascade="all, delete")
     name: str = sa.Column("name", sa.String, nullable=False)
     description: Optional[str] = sa.Column(
         "description", sa.String, nullable=True
     )
 
 
-def init() -> None:
-    os.makedirs(os.path.dirname(get_db_path()), exist_ok=True)
-    Base.metadata.create_all(bind=engine)
+class DeckDailyStats(Base):
+    __tablename__ = "deck_daily_stats"
+
+    deck_id: int = sa.Column(
+        "deck_id",
+        sa.Integer,
+        sa.ForeignKey("deck.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    day: date = sa.Column("day", sa.Date, primary_key=True)
+    new_active_card_count: int = sa.Column(
+        "new_active_card_count",
+        sa.Integer,
+        nullable=False,
+        default=0,
+        server_default="0",
+    )
+    correct_answer_count: int = sa.Column(
+        "correct_answer_count",
+        sa.Integer,
+        nullable=False,
+        default=0,
+        server_default="0",
+    )
+    incorrect_answer_count: int = sa.Column(
+        "incorrect_answer_count",
+        sa.Integer,
+        nullable=False,
+        default=0,
+        server_default="0",
+    )
+
+
+def get_engine() -> Any:
+    global _engine
+    if _engine is None:
+        os.makedirs(os.path.dirname(paths.get_db_path()), exist_ok=True)
+        engine = sa.create_engine(
+            "sqlite:///%s" % os.path.abspath(paths.get_db_path()),
+            json_serializer=json_serializer,
+            poolclass=sa.pool.SingletonThreadPool,
+        )
+        sa.event.listen(engine, "connect", _apply_sqlite_pragmas)
+
+        from drillsrs import journal, migrations
+
+        migrations.upgrade(engine)
+        journal.replay(engine)
+        _engine = engine
+    return _engine
+
+
+def update_answer_counters(connection: Any) -> None:
+    def _answers() -> Any:
+        return sa.select([sa.func.count(UserAnswer.id)]).where(
+            UserAnswer.card_id == Card.id
+        )
+
+    connection.execute(
+        sa.update(Card.__table__).values(
+            first_answer_date=sa.select([sa.func.min(UserAnswer.date)])
+            .where(UserAnswer.card_id == Card.id)
+            .scalar_subquery(),
+            total_answer_count=_answers().scalar_subquery(),
+            correct_answer_count=_answers()
+            .where(UserAnswer.is_correct == 1)
+            .scalar_subquery(),
+            incorrect_answer_count=_answers()
+            .where(UserAnswer.is_correct == 0)
+            .scalar_subquery(),
+        )
+    )
+
+
+def rebuild_daily_stats(
+    connection: Any, deck_id: Optional[int] = None
+) -> None:
+    params = {"deck_id": deck_id}
+    connection.execute(
+        sa.text(
+            "DELETE FROM deck_daily_stats "
+            "WHERE :deck_id IS NULL OR deck_id = :deck_id"
+        ),
+        params,
+    )
+    connection.execute(
+        sa.text(
+            "INSERT INTO deck_daily_stats "
+            "(deck_id, day, new_active_card_count, correct_answer_count, "
+            "incorrect_answer_count) "
+            "SELECT deck_id, day, SUM(new_active), SUM(correct), "
+            "SUM(incorrect) "
+            "FROM ("
+            "SELECT deck_id, date(activation_date) AS day, "
+            "1 AS new_active, 0 AS correct, 0 AS incorrect "
+            "FROM card WHERE activation_date IS NOT NULL "
+            "UNION ALL "
+            "SELECT card.deck_id, date(user_answer.date), 0, "
+            "user_answer.is_correct, 1 - user_answer.is_correct "
+            "FROM user_answer JOIN card ON card.id = user_answer.card_id"
+            ") "
+            "WHERE :deck_id IS NULL OR deck_id = :deck_id "
+            "GROUP BY deck_id, day"
+        ),
+        params,
+    )
+
+
+def add_user_answer(card: Card, user_answer: UserAnswer) -> None:
+    user_answer.card = card
+    if (
+        card.first_answer_date is None
+        or user_answer.date < card.first_answer_date
+    ):
+        card.first_answer_date = user_answer.date
+    card.total_answer_count = (card.total_answer_count or 0) + 1
+    if user_answer.is_correct:
+        card.correct_answer_count = (card.correct_answer_count or 0) + 1
+    else:
+        card.incorrect_answer_count = (card.incorrect_answer_count or 0) + 1
 
 
 def try_get_deck_by_name(session: Any, name: str) -> Optional[Deck]:
@@ -185,6 +395,95 @@ def get_deck_by_name(session: Any, name: str) -> Deck:
     raise error.DeckNotFoundError("A deck with name %r doesn't exist" % name)
 
 
+class DeckSummary(NamedTuple):
+    card_count: int
+    active_card_count: int
+    inactive_card_count: int
+    due_card_count: int
+    next_due_date: Optional[datetime]
+    max_answer_count: int
+    correct_answer_count: int
+    incorrect_answer_count: int
+
+
+def _query_deck_summaries(session: Any, now: datetime) -> Any:
+    is_active = Card.is_active == 1
+    return (
+        session.query(
+            Deck,
+            sa.func.count(Card.id),
+            sa.func.count(sa.case((is_active, 1))),
+            sa.func.count(
+                sa.case((sa.and_(is_active, Card.due_date <= now), 1))
+            ),
+            sa.func.min(sa.case((is_active, Card.due_date))),
+            sa.func.coalesce(sa.func.max(Card.total_answer_count), 0),
+            sa.func.coalesce(sa.func.sum(Card.correct_answer_count), 0),
+            sa.func.coalesce(sa.func.sum(Card.incorrect_answer_count), 0),
+        )
+        .outerjoin(Card, Card.deck_id == Deck.id)
+        .group_by(Deck.id)
+        .order_by(Deck.id)
+    )
+
+
+def _make_deck_summary(row: Any) -> DeckSummary:
+    (
+        card_count,
+        active_card_count,
+        due_card_count,
+        next_due_date,
+        max_answer_count,
+        correct_answer_count,
+        incorrect_answer_count,
+    ) = row
+    return DeckSummary(
+        card_count=card_count,
+        active_card_count=active_card_count,
+        inactive_card_count=card_count - active_card_count,
+        due_card_count=due_card_count,
+        next_due_date=next_due_date,
+        max_answer_count=max_answer_count,
+        correct_answer_count=correct_answer_count,
+        incorrect_answer_count=incorrect_answer_count,
+    )
+
+
+def get_deck_summary(
+    session: Any, deck: Deck, now: Optional[datetime] = None
+) -> DeckSummary:
+    row = (
+        _query_deck_summaries(session, now or datetime.now())
+        .filter(Deck.id == deck.id)
+        .one()
+    )
+    return _make_deck_summary(row[1:])
+
+
+def get_deck_summaries(
+    session: Any, now: Optional[datetime] = None
+) -> List[Tuple[Deck, DeckSummary]]:
+    return [
+        (row[0], _make_deck_summary(row[1:]))
+        for row in _query_deck_summaries(session, now or datetime.now())
+    ]
+
+
+def get_decks_by_names(
+    session: Any, names: List[str], all_decks: bool = False
+) -> List[Deck]:
+    if all_decks:
+        decks = session.query(Deck).order_by(Deck.id).all()
+        if not decks:
+            raise error.DeckNotFoundError(
+                "No deck available. Create one first."
+            )
+        return decks
+    if not names:
+        return [get_deck_by_name(session, "")]
+    return [get_deck_by_name(session, name) for name in names]
+
+
 def try_get_card_by_num(session: Any, deck: Deck, num: int) -> Optional[Card]:
     return (
         session.query(Card)
@@ -209,30 +508,128 @@ def get_max_card_num(session: Any, deck: Deck) -> int:
     ) or 0
 
 
-def get_max_active_card_num(session: Any, deck: Deck) -> int:
+def get_max_card_rank(session: Any, deck: Deck) -> int:
     return (
-        session.query(sa.func.max(Card.num))
+        session.query(sa.func.max(Card.rank))
+        .filter(Card.deck_id == deck.id)
+        .scalar()
+    ) or 0
+
+
+def get_max_active_card_rank(session: Any, deck: Deck) -> int:
+    return (
+        session.query(sa.func.max(Card.rank))
         .filter(Card.deck_id == deck.id)
         .filter(Card.is_active == 1)
         .scalar()
     ) or 0
 
 
-def move_card(session: Any, card: Card, new_num: int) -> Card:
-    if card.num is not None:
-        if new_num > card.num:
-            session.query(Card).filter(Card.deck_id == card.deck.id).filter(
-                Card.num > card.num
-            ).filter(Card.num <= new_num).update({"num": Card.num - 1})
-        else:
-            session.query(Card).filter(Card.deck_id == card.deck.id).filter(
-                Card.num >= new_num
-            ).filter(Card.num < card.num).update({"num": Card.num + 1})
+def _spread_card_ranks(
+    session: Any, deck: Deck, rank: int, count: int, card: Optional[Card]
+) -> List[int]:
+    query = (
+        session.query(Card.id, Card.rank)
+        .filter(Card.deck_id == deck.id)
+        .filter(Card.id != (card.id if card else None))
+    )
+    # grow a window of neighbours around the insertion point until it is
+    # sparse enough, so only a few cards move instead of the whole deck;
+    # larger windows may end up denser, which keeps them from growing forever
+    size = 1
+    while True:
+        before = (
+            query.filter(Card.rank <= rank)
+            .order_by(Card.rank.desc())
+            .limit(size + 1)
+            .all()
+        )
+        after = (
+            query.filter(Card.rank > rank)
+            .order_by(Card.rank.asc())
+            .limit(size + 1)
+            .all()
+        )
+        low = before.pop()[1] if len(before) > size else 0
+        high = after.pop()[1] if len(after) > size else None
+        slots = len(before) + count + len(after)
+        if high is None:
+            step = RANK_GAP
+            break
+        step = (high - low) // (slots + 1)
+        if step >= max(2, RANK_GAP // (2 * size)):
+            break
+        size *= 2
+
+    window = list(reversed(before)) + [None] * count + after
+    new_ranks = {}
+    ranks = []
+    for i, item in enumerate(window, 1):
+        if item is None:
+            ranks.append(low + i * step)
+        elif item[1] != low + i * step:
+            new_ranks[item[0]] = low + i * step
+
+    if new_ranks:
+        table = Card.__table__
+        session.execute(
+            table.update()
+            .where(table.c.id == sa.bindparam("card_id"))
+            .values(rank=sa.bindparam("rank")),
+            [
+                {"card_id": card_id, "rank": card_rank}
+                for card_id, card_rank in new_ranks.items()
+            ],
+        )
+    for obj in session.identity_map.values():
+        if isinstance(obj, Card) and obj.id in new_ranks:
+            sa.orm.attributes.set_committed_value(
+                obj, "rank", new_ranks[obj.id]
+            )
+    return ranks
+
+
+def allocate_card_ranks(
+    session: Any,
+    deck: Deck,
+    rank: int,
+    count: int,
+    card: Optional[Card] = None,
+) -> List[int]:
+    next_rank = (
+        session.query(sa.func.min(Card.rank))
+        .filter(Card.deck_id == deck.id)
+        .filter(Card.rank > rank)
+        .filter(Card.id != (card.id if card else None))
+        .scalar()
+    )
+    if next_rank is None:
+        step = RANK_GAP
+    elif next_rank - rank > count:
+        step = (next_rank - rank) // (count + 1)
+    else:
+        return _spread_card_ranks(session, deck, rank, count, card)
+    return [rank + i * step for i in range(1, count + 1)]
+
+
+def place_card_after(session: Any, deck: Deck, card: Card, rank: int) -> None:
+    card.rank = allocate_card_ranks(session, deck, rank, 1, card)[0]
+
+
+def move_card(session: Any, deck: Deck, card: Card, target: Card) -> None:
+    if target.id == card.id:
+        return
+    if target.rank > card.rank:
+        place_card_after(session, deck, card, target.rank)
     else:
-        session.query(Card).filter(Card.deck_id == card.deck.id).filter(
-            Card.num >= new_num
-        ).update({"num": Card.num + 1})
-    card.num = new_num
+        previous_rank = (
+            session.query(sa.func.max(Card.rank))
+            .filter(Card.deck_id == deck.id)
+            .filter(Card.rank < target.rank)
+            .filter(Card.id != card.id)
+            .scalar()
+        ) or 0
+        place_card_after(session, deck, card, previous_rank)
 
 
 def try_get_tag_by_name(session: Any, deck: Deck, name: str) -> Optional[Tag]:
@@ -249,3 +646,41 @@ def get_tag_by_name(session: Any, deck: Deck, name: str) -> Tag:
     if card:
         return card
     raise error.TagNotFoundError("A tag with name %r doesn't exist" % name)
+
+
+def _delete_card_children(session: Any, card_ids: Any) -> None:
+    session.execute(
+        sa.delete(UserAnswer.__table__).where(UserAnswer.card_id.in_(card_ids))
+    )
+    session.execute(
+        sa.delete(CardTag.__table__).where(CardTag.card_id.in_(card_ids))
+    )
+
+
+def delete_card(session: Any, card: Card) -> None:
+    _delete_card_children(session, [card.id])
+    session.execute(sa.delete(Card.__table__).where(Card.id == card.id))
+    session.expunge(card)
+
+
+def delete_tag(session: Any, tag: Tag) -> None:
+    session.execute(
+        sa.delete(CardTag.__table__).where(CardTag.tag_id == tag.id)
+    )
+    session.execute(sa.delete(Tag.__table__).where(Tag.id == tag.id))
+    session.expunge(tag)
+
+
+def delete_deck(session: Any, deck: Deck) -> None:
+    session.execute(
+        sa.delete(DeckDailyStats.__table__).where(
+            DeckDailyStats.deck_id == deck.id
+        )
+    )
+    _delete_card_children(
+        session, sa.select(Card.id).where(Card.deck_id == deck.id)
+    )
+    session.execute(sa.delete(Card.__table__).where(Card.deck_id == deck.id))
+    session.execute(sa.delete(Tag.__table__).where(Tag.deck_id == deck.id))
+    session.execute(sa.delete(Deck.__table__).where(Deck.id == deck.id))
+    session.expunge(deck)
@@ -24,3 +24,7 @@ class CardAlreadyExistsError(DrillError):
 
 class DeckAlreadyExistsError(DrillError):
     pass
+
+
+class InvalidTagFilterError(DrillError):
+    pass
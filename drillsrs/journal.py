@@ -0,0 +1,184 @@
+import contextlib
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterator, List
+
+import sqlalchemy as sa
+
+from drillsrs import db, paths, scheduler
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # type: ignore
+
+GROUP_SIZE = 20
+JOURNAL_SUFFIX = ".jsonl"
+NEW_SUFFIX = ".new"
+ORPHAN_AGE = 60.0
+
+
+def get_journal_dir() -> str:
+    return os.path.join(paths.get_data_dir(), "journal")
+
+
+def _lock(fd: int) -> bool:
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+
+def _sync(fd: int) -> None:
+    getattr(os, "fdatasync", os.fsync)(fd)
+
+
+class AnswerJournal:
+    def __init__(self) -> None:
+        os.makedirs(get_journal_dir(), exist_ok=True)
+        self.path = os.path.join(
+            get_journal_dir(),
+            "answers-%d-%d%s" % (os.getpid(), time.time(), JOURNAL_SUFFIX),
+        )
+        # lock before the file becomes visible so replay never takes it over
+        new_path = self.path + NEW_SUFFIX
+        self._fd = os.open(
+            new_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600
+        )
+        _lock(self._fd)
+        os.rename(new_path, self.path)
+        self._pending = 0
+
+    def append(self, card: db.Card, user_answer: db.UserAnswer) -> None:
+        line = json.dumps(
+            {
+                "card_id": card.id,
+                "date": user_answer.date.isoformat(),
+                "is_correct": user_answer.is_correct,
+                "answers": list(card.answers),
+            },
+            ensure_ascii=False,
+        )
+        os.write(self._fd, (line + "\n").encode())
+        _sync(self._fd)
+        self._pending += 1
+
+    def commit(self, session: Any) -> None:
+        session.commit()
+        if not self._pending:
+            return
+        # with synchronous=NORMAL a WAL commit only reaches the disk at the
+        # next checkpoint, so force one before dropping the journal
+        busy = session.execute(sa.text("PRAGMA wal_checkpoint(FULL)")).first()
+        session.commit()
+        if busy and busy[0]:
+            # a reader held the checkpoint back, keep the entries for now
+            return
+        os.ftruncate(self._fd, 0)
+        _sync(self._fd)
+        self._pending = 0
+
+    def commit_if_due(self, session: Any) -> None:
+        if self._pending >= GROUP_SIZE:
+            self.commit(session)
+
+    def close(self, session: Any) -> None:
+        self.commit(session)
+        # unlink while still holding the lock so replay can't pick it up
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.path)
+        os.close(self._fd)
+
+
+def _read_entries(handle: Any) -> Iterator[Dict[str, Any]]:
+    for line in handle:
+        try:
+            yield json.loads(line)
+        except ValueError:
+            # a torn write at the end of the journal never got acknowledged
+            continue
+
+
+def _replay_file(session: Any, handle: Any) -> int:
+    count = 0
+    for entry in _read_entries(handle):
+        card = (
+            session.query(db.Card)
+            .filter(db.Card.id == entry["card_id"])
+            .one_or_none()
+        )
+        if not card:
+            continue
+        date = datetime.fromisoformat(entry["date"])
+        exists = (
+            session.query(db.UserAnswer.id)
+            .filter(db.UserAnswer.card_id == card.id)
+            .filter(db.UserAnswer.date == date)
+            .first()
+        )
+        if exists:
+            continue
+        if card.answers != entry["answers"]:
+            card.answers = entry["answers"]
+        user_answer = db.UserAnswer()
+        user_answer.date = date
+        user_answer.is_correct = entry["is_correct"]
+        scheduler.answer_card(card, user_answer)
+        count += 1
+    return count
+
+
+def _remove_orphan(path: str) -> None:
+    # left behind when a review crashed before its journal got renamed
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return
+    try:
+        age = time.time() - os.fstat(fd).st_mtime
+        if age >= ORPHAN_AGE and _lock(fd):
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(path)
+    finally:
+        os.close(fd)
+
+
+def replay(engine: Any) -> None:
+    try:
+        names: List[str] = sorted(os.listdir(get_journal_dir()))
+    except FileNotFoundError:
+        return
+    for name in names:
+        path = os.path.join(get_journal_dir(), name)
+        if name.endswith(JOURNAL_SUFFIX + NEW_SUFFIX):
+            _remove_orphan(path)
+            continue
+        if not name.endswith(JOURNAL_SUFFIX):
+            continue
+        try:
+            handle = open(path, "r", encoding="utf-8")
+        except FileNotFoundError:
+            # the review finished in the meantime
+            continue
+        with handle:
+            if not _lock(handle.fileno()):
+                continue
+            session = db.session_maker(bind=engine)
+            try:
+                count = _replay_file(session, handle)
+                session.commit()
+            finally:
+                session.close()
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(path)
+        if count:
+            print(
+                "Recovered %d answer(s) from an interrupted review." % count,
+                file=sys.stderr,
+            )
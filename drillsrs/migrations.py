@@ -0,0 +1,316 @@
+import io
+import pickle
+from typing import Any, Callable, List, Set
+
+import sqlalchemy as sa
+
+from drillsrs import db, error, scheduler
+
+
+class _AnswerUnpickler(pickle.Unpickler):
+    def find_class(self, module: str, name: str) -> Any:
+        if (module, name) in {
+            ("builtins", "list"),
+            ("sqlalchemy.ext.mutable", "MutableList"),
+        }:
+            return list
+        raise pickle.UnpicklingError(
+            "Refusing to load %s.%s from card answers" % (module, name)
+        )
+
+
+def _get_column_names(connection: Any, table_name: str) -> Set[str]:
+    return {
+        column["name"]
+        for column in sa.inspect(connection).get_columns(table_name)
+    }
+
+
+def _add_columns(connection: Any, table_name: str, *ddls: str) -> None:
+    for ddl in ddls:
+        connection.execute(
+            sa.text("ALTER TABLE %s ADD COLUMN %s" % (table_name, ddl))
+        )
+
+
+def _migrate_answers_to_json(connection: Any) -> None:
+    column_types = {
+        column["name"]: column["type"]
+        for column in sa.inspect(connection).get_columns("card")
+    }
+    # pickled_answers is only left behind by an interrupted conversion
+    if "pickled_answers" not in column_types:
+        if isinstance(column_types["answers"], sa.JSON):
+            return
+        connection.execute(
+            sa.text(
+                "ALTER TABLE card RENAME COLUMN answers TO pickled_answers"
+            )
+        )
+        del column_types["answers"]
+    if "answers" not in column_types:
+        _add_columns(connection, "card", "answers JSON NOT NULL DEFAULT '[]'")
+    values = [
+        {
+            "card_id": row.id,
+            "answers": db.json_serializer(
+                list(_AnswerUnpickler(io.BytesIO(row.pickled_answers)).load())
+            ),
+        }
+        for row in connection.execute(
+            sa.text("SELECT id, pickled_answers FROM card")
+        )
+    ]
+    if values:
+        connection.execute(
+            sa.text("UPDATE card SET answers = :answers WHERE id = :card_id"),
+            values,
+        )
+    connection.execute(sa.text("ALTER TABLE card DROP COLUMN pickled_answers"))
+
+
+def _add_answer_counters(connection: Any) -> None:
+    if "total_answer_count" not in _get_column_names(connection, "card"):
+        _add_columns(
+            connection,
+            "card",
+            "first_answer_date DATETIME",
+            "total_answer_count INTEGER NOT NULL DEFAULT 0",
+            "correct_answer_count INTEGER NOT NULL DEFAULT 0",
+            "incorrect_answer_count INTEGER NOT NULL DEFAULT 0",
+        )
+    db.update_answer_counters(connection)
+
+
+def _add_srs_state(connection: Any) -> None:
+    if "score" not in _get_column_names(connection, "card"):
+        _add_columns(
+            connection,
+            "card",
+            "last_answer_date DATETIME",
+            "score INTEGER NOT NULL DEFAULT 0",
+            "streak INTEGER NOT NULL DEFAULT 0",
+        )
+    scheduler.update_srs_state(connection)
+
+
+def _add_card_indexes(connection: Any) -> None:
+    connection.execute(
+        sa.text(
+            "CREATE INDEX IF NOT EXISTS ix_card_deck_id_active_due_date "
+            "ON card (deck_id, active, due_date)"
+        )
+    )
+    connection.execute(
+        sa.text(
+            "CREATE INDEX IF NOT EXISTS ix_card_deck_id_correct_answer_ratio "
+            "ON card (deck_id, "
+            "CAST(correct_answer_count AS FLOAT) / total_answer_count)"
+        )
+    )
+
+
+def _add_card_ranks(connection: Any) -> None:
+    _add_columns(connection, "card", "rank INTEGER NOT NULL DEFAULT 0")
+    connection.execute(
+        sa.text("UPDATE card SET rank = num * :gap"), {"gap": db.RANK_GAP}
+    )
+    connection.execute(
+        sa.text("CREATE INDEX ix_card_deck_id_rank ON card (deck_id, rank)")
+    )
+    connection.execute(
+        sa.text("CREATE INDEX ix_card_deck_id_num ON card (deck_id, num)")
+    )
+
+
+def _create_card_search(connection: Any) -> None:
+    for ddl in [
+        "CREATE VIRTUAL TABLE card_fts USING fts5("
+        "question, answers, content='card', content_rowid='id', "
+        "tokenize='trigram')",
+        "CREATE TRIGGER card_fts_insert AFTER INSERT ON card BEGIN "
+        "INSERT INTO card_fts (rowid, question, answers) "
+        "VALUES (new.id, new.question, new.answers); "
+        "END",
+        "CREATE TRIGGER card_fts_delete AFTER DELETE ON card BEGIN "
+        "INSERT INTO card_fts (card_fts, rowid, question, answers) "
+        "VALUES ('delete', old.id, old.question, old.answers); "
+        "END",
+        "CREATE TRIGGER card_fts_update "
+        "AFTER UPDATE OF question, answers ON card BEGIN "
+        "INSERT INTO card_fts (card_fts, rowid, question, answers) "
+        "VALUES ('delete', old.id, old.question, old.answers); "
+        "INSERT INTO card_fts (rowid, question, answers) "
+        "VALUES (new.id, new.question, new.answers); "
+        "END",
+    ]:
+        connection.execute(sa.text(ddl))
+
+
+def _add_card_search(connection: Any) -> None:
+    _create_card_search(connection)
+    connection.execute(
+        sa.text("INSERT INTO card_fts (card_fts) VALUES ('rebuild')")
+    )
+
+
+def _bump_daily_stats(
+    deck_id: str, day: str, where: str, **deltas: str
+) -> str:
+    return (
+        "INSERT INTO deck_daily_stats (deck_id, day, %s) "
+        "SELECT %s, %s, %s WHERE %s "
+        "ON CONFLICT (deck_id, day) DO UPDATE SET %s; "
+        % (
+            ", ".join(deltas),
+            deck_id,
+            day,
+            ", ".join(deltas.values()),
+            where,
+            ", ".join(
+                "%s = %s + excluded.%s" % (column, column, column)
+                for column in deltas
+            ),
+        )
+    )
+
+
+def _daily_stats_exist(deck_id: str, day: str) -> str:
+    return (
+        "EXISTS (SELECT 1 FROM deck_daily_stats "
+        "WHERE deck_id = %s AND day = %s)" % (deck_id, day)
+    )
+
+
+def _create_daily_stats_triggers(connection: Any) -> None:
+    answer_deck_id = "(SELECT deck_id FROM card WHERE id = %s.card_id)"
+    for ddl in [
+        "CREATE TRIGGER deck_daily_stats_answer_insert "
+        "AFTER INSERT ON user_answer BEGIN "
+        + _bump_daily_stats(
+            answer_deck_id % "new",
+            "date(new.date)",
+            "1",
+            correct_answer_count="new.is_correct",
+            incorrect_answer_count="1 - new.is_correct",
+        )
+        + "END",
+        # deleting a deck drops its stats first, skip the rows that are gone
+        "CREATE TRIGGER deck_daily_stats_answer_delete "
+        "AFTER DELETE ON user_answer WHEN "
+        + _daily_stats_exist(answer_deck_id % "old", "date(old.date)")
+        + " BEGIN "
+        + _bump_daily_stats(
+            answer_deck_id % "old",
+            "date(old.date)",
+            "1",
+            correct_answer_count="-old.is_correct",
+            incorrect_answer_count="old.is_correct - 1",
+        )
+        + "END",
+        "CREATE TRIGGER deck_daily_stats_card_insert "
+        "AFTER INSERT ON card BEGIN "
+        + _bump_daily_stats(
+            "new.deck_id",
+            "date(new.activation_date)",
+            "new.activation_date IS NOT NULL",
+            new_active_card_count="1",
+        )
+        + "END",
+        "CREATE TRIGGER deck_daily_stats_card_delete "
+        "AFTER DELETE ON card WHEN "
+        + _daily_stats_exist("old.deck_id", "date(old.activation_date)")
+        + " BEGIN "
+        + _bump_daily_stats(
+            "old.deck_id",
+            "date(old.activation_date)",
+            "1",
+            new_active_card_count="-1",
+        )
+        + "END",
+        "CREATE TRIGGER deck_daily_stats_card_update "
+        "AFTER UPDATE OF activation_date ON card "
+        "WHEN old.activation_date IS NOT new.activation_date BEGIN "
+        + _bump_daily_stats(
+            "old.deck_id",
+            "date(old.activation_date)",
+            "old.activation_date IS NOT NULL",
+            new_active_card_count="-1",
+        )
+        + _bump_daily_stats(
+            "new.deck_id",
+            "date(new.activation_date)",
+            "new.activation_date IS NOT NULL",
+            new_active_card_count="1",
+        )
+        + "END",
+    ]:
+        connection.execute(sa.text(ddl))
+
+
+def _add_daily_stats(connection: Any) -> None:
+    connection.execute(
+        sa.text(
+            "CREATE TABLE deck_daily_stats ("
+            "deck_id INTEGER NOT NULL "
+            "REFERENCES deck (id) ON DELETE CASCADE, "
+            "day DATE NOT NULL, "
+            "new_active_card_count INTEGER NOT NULL DEFAULT 0, "
+            "correct_answer_count INTEGER NOT NULL DEFAULT 0, "
+            "incorrect_answer_count INTEGER NOT NULL DEFAULT 0, "
+            "PRIMARY KEY (deck_id, day))"
+        )
+    )
+    _create_daily_stats_triggers(connection)
+    db.rebuild_daily_stats(connection)
+
+
+def _guard_daily_stats_triggers(connection: Any) -> None:
+    for name in [
+        "deck_daily_stats_answer_insert",
+        "deck_daily_stats_answer_delete",
+        "deck_daily_stats_card_insert",
+        "deck_daily_stats_card_delete",
+        "deck_daily_stats_card_update",
+    ]:
+        connection.execute(sa.text("DROP TRIGGER %s" % name))
+    _create_daily_stats_triggers(connection)
+
+
+MIGRATIONS: List[Callable[[Any], None]] = [
+    _migrate_answers_to_json,
+    _add_answer_counters,
+    _add_srs_state,
+    _add_card_indexes,
+    _add_card_ranks,
+    _add_card_search,
+    _add_daily_stats,
+    _guard_daily_stats_triggers,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def upgrade(engine: Any) -> None:
+    with engine.begin() as connection:
+        # pysqlite doesn't open a transaction before DDL on its own
+        connection.exec_driver_sql("BEGIN")
+        version = connection.execute(sa.text("PRAGMA user_version")).scalar()
+        if version == SCHEMA_VERSION:
+            return
+        if version > SCHEMA_VERSION:
+            raise error.DrillError(
+                "The database was created by a newer version of drill-srs "
+                "(schema version %d, supported up to %d)"
+                % (version, SCHEMA_VERSION)
+            )
+
+        if not sa.inspect(connection).has_table("deck"):
+            db.Base.metadata.create_all(bind=connection)
+            _create_card_search(connection)
+            _create_daily_stats_triggers(connection)
+        else:
+            for migration in MIGRATIONS[version:]:
+                migration(connection)
+        connection.execute(
+            sa.text("PRAGMA user_version = %d" % SCHEMA_VERSION)
+        )
@@ -0,0 +1,11 @@
+import os
+
+import xdg
+
+
+def get_data_dir() -> str:
+    return os.path.join(xdg.XDG_DATA_HOME, "drillsrs")
+
+
+def get_db_path() -> str:
+    return os.path.join(get_data_dir(), "decks.sqlite")
@@ -1,5 +1,8 @@
+import itertools
 from datetime import datetime, timedelta
-from typing import Any, List, Optional
+from typing import Any, Iterable, List, Optional, Tuple
+
+import sqlalchemy as sa
 
 from drillsrs import db
 
@@ -18,52 +21,138 @@ THRESHOLDS = [
 ]
 
 
+def _advance(score: int, streak: int, is_correct: bool) -> Tuple[int, int]:
+    if is_correct:
+        return min(score + 1, len(THRESHOLDS) - 1), streak + 1
+    return max(score - 1, 0), 0
+
+
+def replay_answers(user_answers: Iterable[Any]) -> Tuple[int, int]:
+    score, streak = 0, 0
+    for user_answer in user_answers:
+        score, streak = _advance(score, streak, user_answer.is_correct)
+    return score, streak
+
+
+def record_answer(card: db.Card, user_answer: db.UserAnswer) -> None:
+    db.add_user_answer(card, user_answer)
+    card.score, card.streak = _advance(
+        card.score or 0, card.streak or 0, user_answer.is_correct
+    )
+    card.last_answer_date = user_answer.date
+
+
+def answer_card(card: db.Card, user_answer: db.UserAnswer) -> None:
+    record_answer(card, user_answer)
+    if user_answer.is_correct:
+        card.due_date = next_due_date(card)
+
+
+def update_srs_state(connection: Any) -> None:
+    table = db.Card.__table__
+    rows = connection.execute(
+        sa.select(
+            [
+                db.UserAnswer.card_id,
+                db.UserAnswer.date,
+                db.UserAnswer.is_correct,
+            ]
+        ).order_by(db.UserAnswer.card_id, db.UserAnswer.id)
+    )
+    values = []
+    for card_id, group in itertools.groupby(rows, key=lambda row: row.card_id):
+        user_answers = list(group)
+        score, streak = replay_answers(user_answers)
+        values.append(
+            {
+                "card_id": card_id,
+                "last_answer_date": user_answers[-1].date,
+                "score": score,
+                "streak": streak,
+            }
+        )
+    if values:
+        connection.execute(
+            table.update()
+            .where(table.c.id == sa.bindparam("card_id"))
+            .values(
+                last_answer_date=sa.bindparam("last_answer_date"),
+                score=sa.bindparam("score"),
+                streak=sa.bindparam("streak"),
+            ),
+            values,
+        )
+
+
 def consecutive_correct_answers(card: db.Card) -> int:
-    for i, user_answer in enumerate(reversed(card.user_answers)):
-        if not user_answer.is_correct:
-            return i
-    return len(card.user_answers)
+    return card.streak
 
 
-def next_due_date(card: db.Card) -> Optional[datetime]:
-    if not card.is_active:
+def get_due_date(
+    is_active: bool, last_answer_date: Optional[datetime], score: int
+) -> Optional[datetime]:
+    if not is_active:
         return None
-    if not card.user_answers:
+    if not last_answer_date:
         return datetime.now()
+    return last_answer_date + THRESHOLDS[score]
+
+
+def next_due_date(card: db.Card) -> Optional[datetime]:
+    return get_due_date(card.is_active, card.last_answer_date, card.score)
+
 
-    index = 0
-    for user_answer in card.user_answers:
-        if user_answer.is_correct:
-            index = min(index + 1, len(THRESHOLDS) - 1)
-        else:
-            index = max(index - 1, 0)
-    return card.user_answers[-1].date + THRESHOLDS[index]
+def _filter_decks(query: Any, decks: List[db.Deck]) -> Any:
+    return query.filter(db.Card.deck_id.in_([deck.id for deck in decks]))
 
 
 def get_cards_to_study(
-    session: Any, deck: db.Deck, how_many: int
+    session: Any,
+    decks: List[db.Deck],
+    how_many: int,
+    tag_filter: Any = None,
 ) -> List[db.Card]:
-    return list(
-        session.query(db.Card)
-        .filter(db.Card.deck_id == deck.id)
+    query = (
+        _filter_decks(session.query(db.Card), decks)
         .filter(db.Card.is_active == 0)
-        .order_by(db.Card.num.asc())
-        .limit(how_many)
+        .options(sa.orm.selectinload(db.Card.tags))
+        .order_by(db.Card.rank.asc(), db.Card.deck_id.asc())
     )
+    if tag_filter is not None:
+        query = query.filter(tag_filter)
+    return list(query.limit(how_many))
 
 
-def get_due_cards(session: Any, deck: db.Deck) -> List[db.Card]:
-    return list(
-        session.query(db.Card)
-        .filter(db.Card.deck_id == deck.id)
-        .filter(db.Card.is_active)
-        .order_by(db.Card.due_date.asc())
-    )
+def get_next_due_date(
+    session: Any, decks: List[db.Deck], tag_filter: Any = None
+) -> Optional[datetime]:
+    query = _filter_decks(
+        session.query(sa.func.min(db.Card.due_date)), decks
+    ).filter(db.Card.is_active == 1)
+    if tag_filter is not None:
+        query = query.filter(tag_filter)
+    return query.scalar()
 
 
-def get_cards_to_review(session: Any, deck: db.Deck) -> List[db.Card]:
-    return [
-        card
-        for card in get_due_cards(session, deck)
-        if card.due_date and datetime.now() >= card.due_date
-    ]
+def get_cards_to_review(
+    session: Any,
+    decks: List[db.Deck],
+    how_many: Optional[int] = None,
+    tag_filter: Any = None,
+    since: Optional[datetime] = None,
+    now: Optional[datetime] = None,
+) -> List[db.Card]:
+    query = (
+        _filter_decks(session.query(db.Card), decks)
+        .filter(db.Card.is_active == 1)
+        .filter(db.Card.due_date <= (now or datetime.now()))
+        .options(sa.orm.selectinload(db.Card.tags))
+        .order_by(sa.func.random())
+    )
+    if tag_filter is not None:
+        query = query.filter(tag_filter)
+    if since is not None:
+        query = query.filter(db.Card.due_date > since)
+    if how_many is not None:
+        query = query.limit(how_many)
+    return list(query)
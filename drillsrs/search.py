@@ -0,0 +1,94 @@
+import re
+from typing import Any, List, Optional
+
+import sqlalchemy as sa
+
+from drillsrs import db, error
+
+MIN_TERM_LENGTH = 3
+OPERATORS = {"AND", "OR", "NOT"}
+
+card_fts = sa.table(
+    "card_fts", sa.column("rowid"), sa.column("card_fts"), sa.column("rank")
+)
+
+
+def _tokenize(text: str) -> List[str]:
+    return re.findall(r'"(?:[^"]|"")*"\*?|\S+', text)
+
+
+def _get_term(token: str) -> str:
+    term = token.rstrip("*")
+    if term.startswith('"'):
+        term = term[1:]
+    if term.endswith('"'):
+        term = term[:-1]
+    return term.replace('""', '"')
+
+
+def _get_match_query(tokens: List[str]) -> str:
+    parts = []
+    for token in tokens:
+        if token in OPERATORS:
+            parts.append(token)
+            continue
+        part = '"%s"' % _get_term(token).replace('"', '""')
+        if token.endswith("*"):
+            part += " *"
+        parts.append(part)
+    return " ".join(parts)
+
+
+def _escape_like(term: str) -> str:
+    return re.sub(r"([\\%_])", r"\\\1", term)
+
+
+def _get_like_filter(tokens: List[str]) -> Any:
+    groups: List[List[Any]] = [[]]
+    negate = False
+    for token in tokens:
+        if token == "OR":
+            groups.append([])
+        elif token == "NOT":
+            negate = True
+        elif token != "AND":
+            pattern = "%%%s%%" % _escape_like(_get_term(token))
+            clause = sa.or_(
+                db.Card.question.like(pattern, escape="\\"),
+                sa.cast(db.Card.answers, sa.String).like(pattern, escape="\\"),
+            )
+            groups[-1].append(sa.not_(clause) if negate else clause)
+            negate = False
+    return sa.or_(*(sa.and_(*group) for group in groups if group))
+
+
+def search_cards(
+    session: Any, deck: db.Deck, text: str, limit: Optional[int] = None
+) -> List[db.Card]:
+    tokens = _tokenize(text)
+    terms = [_get_term(token) for token in tokens if token not in OPERATORS]
+    if not any(terms):
+        raise error.DrillError("The search query can't be empty")
+
+    query = session.query(db.Card).filter(db.Card.deck_id == deck.id)
+    if all(len(term) >= MIN_TERM_LENGTH for term in terms):
+        query = (
+            query.join(card_fts, card_fts.c.rowid == db.Card.id)
+            .filter(card_fts.c.card_fts.match(_get_match_query(tokens)))
+            .order_by(card_fts.c.rank)
+        )
+    else:
+        # the trigram index can't match anything shorter than a trigram
+        query = query.filter(_get_like_filter(tokens)).order_by(
+            db.Card.rank.asc()
+        )
+
+    query = query.options(sa.orm.selectinload(db.Card.tags))
+    if limit is not None:
+        query = query.limit(limit)
+    try:
+        return query.all()
+    except sa.exc.OperationalError as ex:
+        if "fts5" not in str(ex):
+            raise
+        raise error.DrillError("Invalid search query %r" % text)
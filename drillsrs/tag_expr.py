@@ -0,0 +1,98 @@
+import re
+from typing import Any, Dict, List, NoReturn, Optional, Set
+
+import sqlalchemy as sa
+
+from drillsrs import db, error
+
+AND = "and"
+OR = "or"
+NOT = "not"
+
+
+def _tokenize(text: str) -> List[str]:
+    return re.findall(r"[()]|[^\s()]+", text)
+
+
+class _Parser:
+    def __init__(self, text: str, tag_ids: Dict[str, Set[int]]) -> None:
+        self._text = text
+        self._tokens = _tokenize(text)
+        self._pos = 0
+        self._tag_ids = tag_ids
+
+    def _peek(self) -> str:
+        if self._pos < len(self._tokens):
+            return self._tokens[self._pos]
+        return ""
+
+    def _next(self) -> str:
+        token = self._peek()
+        if not token:
+            self._fail("unexpected end")
+        self._pos += 1
+        return token
+
+    def _fail(self, reason: str) -> NoReturn:
+        raise error.InvalidTagFilterError(
+            "Invalid tag filter %r: %s" % (self._text, reason)
+        )
+
+    def parse(self) -> Any:
+        clause = self._parse_or()
+        if self._peek():
+            self._fail("unexpected %r" % self._peek())
+        return clause
+
+    def _parse_or(self) -> Any:
+        clauses = [self._parse_and()]
+        while self._peek().lower() == OR:
+            self._next()
+            clauses.append(self._parse_and())
+        return sa.or_(*clauses) if len(clauses) > 1 else clauses[0]
+
+    def _parse_and(self) -> Any:
+        clauses = [self._parse_not()]
+        while self._peek().lower() == AND:
+            self._next()
+            clauses.append(self._parse_not())
+        return sa.and_(*clauses) if len(clauses) > 1 else clauses[0]
+
+    def _parse_not(self) -> Any:
+        token = self._next()
+        if token.lower() == NOT:
+            return sa.not_(self._parse_not())
+        if token == "(":
+            clause = self._parse_or()
+            if self._next() != ")":
+                self._fail("expected ')'")
+            return clause
+        if token == ")" or token.lower() in (AND, OR):
+            self._fail("unexpected %r" % token)
+        return self._parse_tag(token)
+
+    def _parse_tag(self, name: str) -> Any:
+        tag_ids = self._tag_ids.get(name.lower())
+        if not tag_ids:
+            raise error.TagNotFoundError(
+                "A tag with name %r doesn't exist" % name
+            )
+        return (
+            sa.select([db.CardTag.card_id])
+            .where(db.CardTag.card_id == db.Card.id)
+            .where(db.CardTag.tag_id.in_(tag_ids))
+            .exists()
+        )
+
+
+def get_tag_filter(
+    session: Any, decks: List[db.Deck], text: Optional[str]
+) -> Any:
+    if text is None:
+        return None
+    tag_ids: Dict[str, Set[int]] = {}
+    for tag_id, name in session.query(db.Tag.id, db.Tag.name).filter(
+        db.Tag.deck_id.in_([deck.id for deck in decks])
+    ):
+        tag_ids.setdefault(name.lower(), set()).add(tag_id)
+    return _Parser(text, tag_ids).parse()
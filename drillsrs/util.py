@@ -1,9 +1,10 @@
 import os
 import readline
-from datetime import timedelta
-from typing import List
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, List
 
-from drillsrs import db
+if TYPE_CHECKING:
+    from drillsrs import db
 
 COLOR_SUCCESS = "\x1B[38;5;10m"
 COLOR_FAIL = "\x1B[38;5;9m"
@@ -64,14 +65,41 @@ def color(text: str, color_str: str) -> str:
     return color_str + text + COLOR_RESET
 
 
-def format_card_tag(tag: db.Tag) -> str:
+def format_card_tag(tag: "db.Tag") -> str:
     return color(tag.name, COLOR_TAGS.get(tag.color, COLOR_TAGS["grey"]))
 
 
-def format_card_tags(tags: List[db.Tag]) -> str:
+def format_card_tags(tags: List["db.Tag"]) -> str:
     return ", ".join(format_card_tag(tag) for tag in tags)
 
 
+def print_card(index_length: int, card: "db.Card", show_answers: bool) -> None:
+    print("Card %*s: " % (index_length, "#%s" % card.num), end="")
+    if card.is_active:
+        due_date = card.due_date
+        assert due_date
+
+        print(
+            "(answered %d time(s), %6.02f%% correct, due %s)"
+            % (
+                card.total_answer_count,
+                (
+                    card.correct_answer_count * 100.0 / card.total_answer_count
+                    if card.total_answer_count
+                    else 100
+                ),
+                format_timedelta(due_date - datetime.now()),
+            ),
+            end=" ",
+        )
+    print(card.question, end="")
+    if show_answers:
+        print(": %s" % ", ".join(card.answers), end="")
+    if card.tags:
+        print(" [%s]" % format_card_tags(card.tags), end="")
+    print()
+
+
 def get_data(file_name: str) -> str:
     here = os.path.dirname(__file__)
     template_path = os.path.join(here, "data", file_name)
@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+from typing import Any, Callable
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def drill(tmp_path: Any) -> Callable[..., subprocess.CompletedProcess]:
+    env = dict(
+        os.environ,
+        XDG_DATA_HOME=str(tmp_path / "data"),
+        PYTHONPATH=os.pathsep.join(
+            filter(None, [ROOT_DIR, os.environ.get("PYTHONPATH")])
+        ),
+    )
+
+    def run(*args: str, **kwargs: Any) -> subprocess.CompletedProcess:
+        kwargs.setdefault("stdout", subprocess.PIPE)
+        kwargs.setdefault("stderr", subprocess.PIPE)
+        return subprocess.run(
+            [sys.executable, *args],
+            env=env,
+            universal_newlines=True,
+            check=True,
+            **kwargs
+        )
+
+    return run
@@ -0,0 +1,61 @@
+import contextlib
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from typing import Any
+
+from tests.util import get_heavy_imports
+
+# wall time of a whole `drill-srs due` process, interpreter start included
+DUE_TIME_BUDGET = 0.5
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+
+def _create_deck(drill: Any, tmp_path: Any) -> None:
+    drill("-m", "drillsrs", "create-deck", "test")
+    drill(
+        "-m",
+        "drillsrs",
+        "add-cards",
+        "test",
+        input="".join("q%d\ta%d\n" % (i, i) for i in range(10)),
+    )
+    now = datetime.now()
+    db_path = os.path.join(str(tmp_path), "data", "drillsrs", "decks.sqlite")
+    with contextlib.closing(sqlite3.connect(db_path)) as connection:
+        for num, due_date in [
+            (1, now - timedelta(days=1)),
+            (2, now - timedelta(minutes=1)),
+            (3, now + timedelta(minutes=30)),
+            (4, now + timedelta(days=2)),
+        ]:
+            connection.execute(
+                "UPDATE card SET active = 1, due_date = ? WHERE num = ?",
+                (due_date.strftime(DATE_FORMAT), num),
+            )
+        connection.commit()
+
+
+def test_due_counts(drill: Any, tmp_path: Any) -> None:
+    _create_deck(drill, tmp_path)
+    result = drill("-m", "drillsrs", "due")
+    name, due_count, soon_count, next_due_date = result.stdout.split("\t")
+    assert (name, due_count, soon_count) == ("test", "2", "3")
+    assert datetime.fromisoformat(next_due_date.strip()) > datetime.now()
+
+
+def test_due_skips_heavy_imports(drill: Any, tmp_path: Any) -> None:
+    _create_deck(drill, tmp_path)
+    result = drill("-X", "importtime", "-m", "drillsrs", "due")
+    assert get_heavy_imports(result.stderr) == []
+
+
+def test_due_wall_time(drill: Any, tmp_path: Any) -> None:
+    _create_deck(drill, tmp_path)
+    elapsed = []
+    for _ in range(3):
+        start = time.perf_counter()
+        drill("-m", "drillsrs", "due")
+        elapsed.append(time.perf_counter() - start)
+    assert min(elapsed) < DUE_TIME_BUDGET
@@ -0,0 +1,26 @@
+from typing import Any, List
+
+import pytest
+
+from drillsrs import cmd
+from tests.util import get_heavy_imports, get_import_times
+
+# seconds spent importing modules, summed over the whole process
+IMPORT_TIME_BUDGET = 0.2
+
+
+@pytest.mark.parametrize("args", [["--help"], ["how-to"]])
+def test_trivial_commands_start_fast(drill: Any, args: List[str]) -> None:
+    result = drill("-X", "importtime", "-m", "drillsrs", *args)
+    assert get_heavy_imports(result.stderr) == []
+    total = sum(us for _, us in get_import_times(result.stderr)) / 1e6
+    assert total < IMPORT_TIME_BUDGET
+
+
+def test_registry_matches_command_classes() -> None:
+    for command in cmd.get_all_commands():
+        assert isinstance(command, cmd.LazyCommand)
+        target = command.command
+        assert type(target).__name__ == command.class_name
+        assert target.names == command.names
+        assert target.description == command.description
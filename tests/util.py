@@ -0,0 +1,21 @@
+from typing import Any, List
+
+HEAVY_MODULES = {"sqlalchemy", "jinja2", "dateutil"}
+
+
+def get_import_times(stderr: str) -> List[Any]:
+    times = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:") :].split("|")
+        times.append((name.strip(), int(self_us)))
+    return times
+
+
+def get_heavy_imports(stderr: str) -> List[str]:
+    return [
+        name
+        for name, _ in get_import_times(stderr)
+        if name.split(".")[0] in HEAVY_MODULES
+    ]